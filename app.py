@@ -1,25 +1,35 @@
+import time
+
+_script_start = time.perf_counter()
+
 import streamlit as st
 import warnings
-from src.ai_chat import render_chat, summarize_dataset
-from src.data_loader import load_data
-from src.analysis import (
-    distributions,
-    correlations,
-    trends,
-    anomalies,
-    clustering,
-    variance,
-)
 from utils.cache_utils import cache_clear_button
+from utils.lazy_imports import import_report, lazy_import, record_timing
 from dotenv import load_dotenv
-import pandas as pd
 import streamlit as st  # <-- Adicionar st. importado
+import os
+
+# Provedores do Chat IA; "Mock" (local, respostas simuladas para testes sem API)
+# só aparece com EDA_ENABLE_MOCK=1
+PROVIDERS = ["OpenAI", "Groq", "Gemini"]
+if os.getenv("EDA_ENABLE_MOCK", "").lower() in ("1", "true", "yes"):
+    PROVIDERS.append("Mock")
+
+# Uploads acima deste tamanho (MB) são lidos em streaming, em blocos
+STREAMING_THRESHOLD_MB = float(os.getenv("EDA_STREAMING_THRESHOLD_MB", "1024"))
 
 # Este bloco impede que o warning "st.rerun() in callback is a no-op" apareça.
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
+# Abas importadas sob demanda (início a frio mais rápido)
+def analysis_module(name):
+    """Módulo da aba (src.analysis.<name>): sklearn, seaborn etc. só quando ela abre."""
+    return lazy_import(f"src.analysis.{name}", f"aba {name}")
+
+
 # Funções de Callback para persistência do estado
 def update_tab_index():
     """Atualiza o índice da aba ativa usando a chave do widget (tab_selector)"""
@@ -153,6 +163,8 @@ if "uploader_key" not in st.session_state:
 uploaded_file = st.file_uploader(
     "📂 Envie seu arquivo CSV", type=["csv"], key=st.session_state["uploader_key"]
 )
+# Primeira execução do processo: tempo até a tela de upload (sem as libs pesadas)
+record_timing("tela de upload", time.perf_counter() - _script_start, "início")
 
 if uploaded_file:
     # ====================================================
@@ -161,6 +173,10 @@ if uploaded_file:
     # ====================================================
     loading_container = st.empty()
 
+    # Leitura e Chat IA só são importados quando há arquivo
+    data_loader = lazy_import("src.data_loader", "upload")
+    ai_chat = lazy_import("src.ai_chat", "upload")
+
     # ====================================================
     # 🌀 LOADING VISUAL CONDICIONAL E BLOQUEANTE
     # ====================================================
@@ -196,34 +212,97 @@ if uploaded_file:
 
     # ----------------------------------------------------
     # AGORA processa os dados (load_data é cacheada)
+    # Arquivos acima do limite são lidos em streaming, em blocos.
     # ----------------------------------------------------
-    data, numeric_cols, categorical_cols = load_data(uploaded_file)
+    streaming_mode = uploaded_file.size > STREAMING_THRESHOLD_MB * 1024**2
+    if streaming_mode:
+        data, numeric_cols, categorical_cols = data_loader.load_data_streaming(
+            uploaded_file
+        )
+    else:
+        data, numeric_cols, categorical_cols = data_loader.load_data(uploaded_file)
+
+    if data is None:
+        loading_container.empty()
+        st.stop()
+
+    # ====================================================
+    # ➕ Incrementos diários: anexa ao dataset atual sem recalcular tudo
+    # ====================================================
+    if not streaming_mode:
+        with st.expander("➕ Anexar dados ao dataset atual"):
+            append_files = st.file_uploader(
+                "📂 CSVs com as mesmas colunas",
+                type=["csv"],
+                accept_multiple_files=True,
+                key=f"append_{st.session_state['uploader_key']}",
+            )
+        if append_files:
+            data, numeric_cols, categorical_cols = data_loader.append_data(
+                data, append_files
+            )
+
+    # ====================================================
+    # 🔄 Limpa histórico e cache de sessão ao carregar novo arquivo
+    # ====================================================
+    if st.session_state.get("loaded_file_hash") != st.session_state.get("file_hash"):
+        for key in ["chat_history", "dataset_summary", "memoria_carregada"]:
+            if key in st.session_state:
+                del st.session_state[key]
+        st.session_state["loaded_file_hash"] = st.session_state.get("file_hash")
 
     # ====================================================
     # GERAÇÃO DO SUMÁRIO PARA O CHAT IA
     # ====================================================
     if "dataset_summary" not in st.session_state:
         with st.spinner("🧠 Gerando sumário do dataset para o Chat IA..."):
-            # ❗ CONFIRME SE SEU ARQUIVO DE CHAT ESTÁ AQUI
-            from src.ai_chat import summarize_dataset
-
             # O sumário deve ser gerado UMA ÚNICA VEZ
-            st.session_state["dataset_summary"] = summarize_dataset(data)
+            if streaming_mode:
+                st.session_state["dataset_summary"] = ai_chat.summarize_stream(
+                    st.session_state.get("stream_info")
+                )
+            else:
+                st.session_state["dataset_summary"] = ai_chat.summarize_dataset(data)
 
     # Remove o flag de loading após o carregamento pesado
     if "is_loading" in st.session_state:
         del st.session_state["is_loading"]
 
-    # ====================================================
-    # 🔄 Limpa histórico e cache de sessão ao carregar novo arquivo
-    # ====================================================
-    for key in ["chat_history", "dataset_summary", "memoria_carregada"]:
-        if key in st.session_state:
-            del st.session_state[key]
+    if streaming_mode:
+        stream_info = st.session_state.get("stream_info", {})
+        st.warning(
+            f"🌊 Arquivo grande lido em streaming: {stream_info.get('rows', 0)} linhas "
+            f"no total. As estatísticas do Chat IA cobrem o arquivo inteiro; os "
+            f"gráficos usam uma amostra aleatória de {data.shape[0]} linhas."
+        )
 
     st.success(
         f"✅ Arquivo carregado: {data.shape[0]} linhas, {data.shape[1]} colunas."
     )
+    if not streaming_mode and append_files:
+        st.info(
+            f"➕ {st.session_state.get('appended_rows', 0)} linhas anexadas de "
+            f"{len(append_files)} arquivo(s)."
+        )
+
+    # Relatório de ingestão (tempo de parse e memória por coluna)
+    load_report = st.session_state.get("load_report")
+    if load_report:
+        columns_report = load_report["columns"]
+        total_before = columns_report["Memória antes (MB)"].sum()
+        total_after = columns_report["Memória depois (MB)"].sum()
+        with st.expander("⚙️ Relatório de ingestão"):
+            st.write(
+                f"Leitor: **{load_report['engine']}** · "
+                f"parse: {load_report['parse_seconds']:.2f}s · "
+                f"otimização: {load_report['optimize_seconds']:.2f}s · "
+                f"memória: {total_before:.1f} MB → {total_after:.1f} MB"
+            )
+            st.dataframe(columns_report)
+
+    # Importações sob demanda (início a frio): tela de upload, abas e provedores
+    with st.expander("⏱️ Tempo de importação"):
+        st.dataframe(import_report().style.format({"Tempo (s)": "{:.3f}"}))
 
     # CHAMADA CORRETA: Usa a função importada
     cache_clear_button()
@@ -259,17 +338,17 @@ if uploaded_file:
     active_index = st.session_state.get("active_tab_index", 0)
 
     if tab_labels[active_index] == "📊 Distribuições":
-        distributions.render(data, numeric_cols, categorical_cols)
+        analysis_module("distributions").render(data, numeric_cols, categorical_cols)
     elif tab_labels[active_index] == "🔍 Correlações":
-        correlations.render(data, numeric_cols)
+        analysis_module("correlations").render(data, numeric_cols)
     elif tab_labels[active_index] == "📈 Tendências":
-        trends.render(data, numeric_cols)
+        analysis_module("trends").render(data, numeric_cols)
     elif tab_labels[active_index] == "📉 Variância":
-        variance.render(data, numeric_cols)
+        analysis_module("variance").render(data, numeric_cols)
     elif tab_labels[active_index] == "⚠️ Anomalias":
-        anomalies.render(data, numeric_cols)
+        analysis_module("anomalies").render(data, numeric_cols)
     elif tab_labels[active_index] == "🧩 Clusters":
-        clustering.render(data, numeric_cols)
+        analysis_module("clustering").render(data, numeric_cols)
     elif tab_labels[active_index] == "🤖 Chat IA":
         # ====================================================
         # 💬 Conteúdo da Aba Chat IA
@@ -289,23 +368,23 @@ if uploaded_file:
         with col1:
             provider = st.selectbox(
                 "Selecione o provedor de IA:",
-                ["OpenAI", "Groq", "Gemini"],
+                PROVIDERS,
                 index=(
                     0
-                    if not st.session_state["provider"]
-                    else ["OpenAI", "Groq", "Gemini"].index(
-                        st.session_state["provider"]
-                    )
+                    if st.session_state["provider"] not in PROVIDERS
+                    else PROVIDERS.index(st.session_state["provider"])
                 ),
                 key="provider_selector",
             )
 
         with col2:
+            # O provedor local (Mock) não usa chave: serve para testar offline
             api_key = st.text_input(
                 f"Insira sua API Key ({provider})",
                 type="password",
-                value=st.session_state.get("user_api_key", ""),
+                value=st.session_state.get("api_keys", {}).get(provider, ""),
                 key="api_key_input",
+                disabled=provider == "Mock",
             )
 
         # ====================================================
@@ -319,9 +398,20 @@ if uploaded_file:
             if st.button("💾 Salvar Configuração de API"):
                 st.session_state["provider"] = provider
                 st.session_state["user_api_key"] = api_key
+                # Chaves salvas de outros provedores viram failover
+                st.session_state.setdefault("api_keys", {})[provider] = api_key
                 st.session_state["chat_history"] = []
                 st.success("✅ Configuração salva e chat resetado!")
 
+        with col2:
+            st.toggle(
+                "Pedido duplicado (hedge)",
+                key="llm_hedge",
+                help="Se o provedor passar do seu p95 sem responder, o mesmo "
+                "pedido vai ao próximo provedor com chave salva; vale a "
+                "primeira resposta.",
+            )
+
         with col3:  # Coluna para o novo botão de limpeza
             st.button(
                 "🗑️ Limpar Chat",
@@ -332,7 +422,7 @@ if uploaded_file:
         st.divider()
 
         # ---- Chat em si ----
-        render_chat(
+        ai_chat.render_chat(
             data=data,
             numeric_cols=numeric_cols,
             categorical_cols=categorical_cols,
@@ -1,38 +1,64 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import concurrent.futures
-from utils.memoria_db import salvar_memoria, carregar_memoria
-
-# Tentativa de import das bibliotecas de LLM
-try:
-    import openai
-except ImportError:
-    openai = None
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from utils import response_cache
+from utils.memoria_db import (
+    salvar_memoria_async,
+    memorias_relevantes,
+)
+from src.analysis.profile import get_profile
+from src.chat_context import build_context
+from src.llm_router import (
+    MOCK_ENABLED,
+    Candidate,
+    mock_stream,
+    route_stream,
+    stats_table,
+)
+from utils.lazy_imports import optional_import
+
+# SDKs de cada provedor: importados só quando o provedor é usado (são pesados)
+PROVIDER_SDKS = {
+    "OpenAI": ("openai",),
+    "Groq": ("openai",),
+    "Gemini": ("google.ai.generativelanguage",),
+}
+
+# Medições de latência guardadas por provedor (últimas N respostas)
+LATENCY_HISTORY = 50
+
+# Clientes de LLM mantidos abertos (um por provedor + chave) e threads do executor
+MAX_POOLED_CLIENTS = 32
+LLM_MAX_WORKERS = int(os.getenv("EDA_LLM_WORKERS", "8"))
+# Timeout por requisição (as retentativas ficam com o roteador)
+LLM_TIMEOUT_S = float(os.getenv("EDA_LLM_TIMEOUT_S", "60"))
+# Escopo da memória do chat: "usuario" (login, ou só o dataset sem login),
+# "dataset" (compartilhada por todos) ou "sessao" (isolada por sessão)
+MEMORY_SCOPE = os.getenv("EDA_MEMORIA_ESCOPO", "usuario")
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+OPENAI_MODEL = "gpt-4o-mini"
+GROQ_DEFAULT_MODEL = "llama3-8b-8192"
+GEMINI_MODEL = "gemini-2.5-flash"
 
 
 # ==========================================
 # 🔹 Resumo de dataset (com cache)
 # ==========================================
-@st.cache_data(show_spinner=False)
-def summarize_dataset(df: pd.DataFrame) -> str:
-    if df is None or df.empty:
-        return "Nenhum dado foi carregado."
-
-    resumo = [f"O dataset possui {df.shape[0]} linhas e {df.shape[1]} colunas."]
-    tipos = df.dtypes.value_counts().to_dict()
+def _format_summary(n_rows, n_cols, dtype_counts, stats) -> str:
+    """Monta o texto do sumário a partir de contagens e de uma tabela mean/std/min/max."""
+    resumo = [f"O dataset possui {n_rows} linhas e {n_cols} colunas."]
     resumo.append(
-        "Tipos de dados → " + ", ".join([f"{k}: {v}" for k, v in tipos.items()])
+        "Tipos de dados → " + ", ".join([f"{k}: {v}" for k, v in dtype_counts.items()])
     )
 
-    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
-    if numeric_cols:
-        stats = df[numeric_cols].describe().T[["mean", "std", "min", "max"]]
+    if stats is not None and not stats.empty:
         resumo.append("Estatísticas resumidas das variáveis numéricas:")
         for col, row in stats.iterrows():
             resumo.append(
@@ -42,6 +68,32 @@ def summarize_dataset(df: pd.DataFrame) -> str:
     return "\n".join(resumo)
 
 
+def summarize_dataset(df: pd.DataFrame) -> str:
+    if df is None or df.empty:
+        return "Nenhum dado foi carregado."
+
+    # O perfil do dataset já é cacheado por hash; aqui só formatamos o texto
+    profile = get_profile(df)
+    stats = None
+    if profile.numeric_cols:
+        stats = profile.describe()[["mean", "std", "min", "max"]]
+    return _format_summary(profile.n_rows, profile.n_cols, profile.dtype_counts, stats)
+
+
+def summarize_stream(stream_info: dict) -> str:
+    """
+    Mesmo sumário de summarize_dataset, mas a partir das estatísticas
+    acumuladas no modo streaming (sem o DataFrame completo).
+    """
+    if not stream_info or not stream_info["rows"]:
+        return "Nenhum dado foi carregado."
+
+    dtypes = stream_info["dtypes"]
+    tipos = pd.Series(dtypes).value_counts().to_dict()
+    stats = stream_info["stats"].to_frame()[["mean", "std", "min", "max"]]
+    return _format_summary(stream_info["rows"], len(dtypes), tipos, stats)
+
+
 # ==========================================
 # 🧠 Memória Persistente
 # ==========================================
@@ -63,90 +115,317 @@ def show_history():
 # ==========================================
 # 🤖 Geração de resposta
 # ==========================================
-def generate_response(
-    prompt, chat_history, dataset_summary, api_key, provider, model_name=None
-):
-    if not api_key or not provider:
-        return "⚠️ Configure o provedor e insira a chave da API antes de usar o chat."
+def _history_window(chat_history):
+    """Últimas 6 mensagens do histórico, sem o cabeçalho de timestamp da memória."""
+    window = []
+    for msg in chat_history[-6:]:  # Limita o histórico para as últimas 6 mensagens
+        content = msg["content"]
+        if content.startswith("🕒"):
+            content = "\n".join(content.split("\n")[2:])
+        # Tenta pegar apenas o conteúdo após o timestamp
+        window.append({"role": msg["role"], "content": content.strip()})
+    return window
+
+
+def _memory_scope():
+    """
+    Escopo da memória da sessão: (dataset carregado, usuário), conforme
+    MEMORY_SCOPE. No padrão ("usuario") o usuário é o e-mail do login do
+    Streamlit; sem login o escopo é só o dataset (usuário None), para que a
+    memória sirva entre sessões. Interações antigas só voltam ao contexto no
+    mesmo escopo.
+    """
+    if "memoria_usuario" not in st.session_state:
+        usuario = None
+        if MEMORY_SCOPE == "sessao":
+            usuario = uuid.uuid4().hex
+        elif MEMORY_SCOPE != "dataset":
+            try:
+                logged_in = getattr(st.user, "is_logged_in", False)
+                usuario = st.user.get("email") if logged_in else None
+            except Exception:
+                usuario = None
+        st.session_state["memoria_usuario"] = usuario
+    return st.session_state.get("file_hash"), st.session_state["memoria_usuario"]
+
 
-    # Novo: Prepara o histórico para a API
+def _relevant_memories(prompt):
+    """Interações antigas parecidas com a pergunta (índice local; [] se falhar)."""
+    try:
+        file_hash, usuario = _memory_scope()
+        return memorias_relevantes(prompt, file_hash=file_hash, usuario=usuario)
+    except Exception:
+        return []
+
+
+def _build_messages(
+    prompt, chat_history, dataset_summary, provider=None, profile=None, memories=None
+):
+    """
+    Mensagens enviadas ao modelo: sistema, contexto do dataset, interações
+    antigas relevantes e histórico recente dentro do orçamento de tokens do
+    provedor, e o prompt.
+    """
     system_prompt = "Você é um analista de dados útil e explicativo. Seu conhecimento é limitado ao contexto do dataset fornecido."
+    context, history = build_context(
+        prompt,
+        _history_window(chat_history),
+        provider,
+        profile=profile,
+        summary=dataset_summary,
+        memories=memories,
+    )
     messages = [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
-            "content": f"Contexto do Dataset: {dataset_summary[:1000]}",
+            "content": f"Contexto do Dataset: {context}",
         },  # Adiciona o contexto como a primeira mensagem do usuário/sistema
     ]
-    # 2. Histórico da conversa (limpando o timestamp da memória)
-    for msg in chat_history[-6:]:  # Limita o histórico para as últimas 6 mensagens
-        content = msg["content"]
-        if content.startswith("🕒"):
-            content = "\n".join(content.split("\n")[2:])
-        # Tenta pegar apenas o conteúdo após o timestamp
-        messages.append({"role": msg["role"], "content": content.strip()})
+    # 2. Histórico da conversa (já limpo e dentro do orçamento)
+    messages.extend(history)
 
     # 3. Adiciona o prompt atual do usuário como a última mensagem
     messages.append({"role": "user", "content": prompt})
+    return messages
 
-    try:
-        if provider == "OpenAI" and openai:
-            client = openai.OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                # USAR A NOVA LISTA DE MENSAGENS
-                messages=messages,
-                temperature=0.3,
-            )
-            return response.choices[0].message.content.strip()
 
-        elif provider == "Groq" and openai:
-            client = openai.OpenAI(
-                api_key=api_key, base_url="https://api.groq.com/openai/v1"
-            )
-            model_to_use = model_name or "llama3-8b-8192"
-            response = client.chat.completions.create(
-                model=model_to_use,
-                # USAR A NOVA LISTA DE MENSAGENS
-                messages=messages,
-                temperature=0.3,
-            )
-            return response.choices[0].message.content.strip()
-
-        elif provider == "Gemini" and genai:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            # PRECISA USAR O CHAT SERVICE DO GEMINI PARA MANTER A MEMÓRIA
-            # Vamos simular a passagem de contexto no prompt por simplicidade AGORA, mas
-            # o ideal seria usar o client.chats().send_message() para Gemini.
-            context_prompt = "\n".join(
-                [f"{m['role']}: {m['content']}" for m in messages]
-            )
-            response = model.generate_content(context_prompt)
-            return response.text
+def _model_for(provider, model_name=None):
+    if provider == "Groq":
+        return model_name or GROQ_DEFAULT_MODEL
+    return {"OpenAI": OPENAI_MODEL, "Gemini": GEMINI_MODEL, "Mock": "local"}.get(
+        provider
+    )
 
-        else:
-            return "⚠️ Nenhum provedor válido configurado ou biblioteca ausente."
 
-    # Trata erros de cota e conexão de forma mais amigável
-    except Exception as e:
-        erro_str = str(e)
+def _response_key(prompt, chat_history, provider, model_name=None) -> str:
+    """Chave do cache de respostas para a pergunta no dataset carregado."""
+    return response_cache.make_key(
+        st.session_state.get("file_hash"),
+        provider,
+        _model_for(provider, model_name),
+        prompt,
+        _history_window(chat_history),
+    )
+
+
+def _friendly_error(e: Exception) -> str:
+    """Trata erros de cota e conexão de forma mais amigável."""
+    erro_str = str(e)
+
+    if "insufficient_quota" in erro_str or "429" in erro_str:
+        return "⚠️ Erro de cota/limite de uso excedido. Verifique seu plano na API do provedor."
+    elif "API key is not valid" in erro_str or "401" in erro_str:
+        return "⚠️ Erro de autenticação. A API Key inserida é inválida."
+
+    return f"⚠️ Erro ao conectar à API: {e}"
+
+
+# ==========================================
+# 🔌 Clientes e executor compartilhados (processo)
+# ==========================================
+@st.cache_resource(show_spinner=False)
+def _client_pool():
+    """Clientes por (provedor, hash da chave), reutilizados entre turnos e sessões."""
+    return {"clients": OrderedDict(), "lock": threading.Lock()}
+
+
+def _sdk(provider):
+    """Módulos do SDK do provedor (importados no primeiro uso), ou None se ausente."""
+    modules = [
+        optional_import(name, f"provedor {provider}")
+        for name in PROVIDER_SDKS.get(provider, ())
+    ]
+    return modules if modules and all(modules) else None
+
+
+def preload_provider(provider):
+    """Importa o SDK do provedor em segundo plano, enquanto a pergunta é digitada."""
+    if provider in PROVIDER_SDKS:
+        _executor().submit(_sdk, provider)
+
+
+def _make_client(provider, api_key):
+    if provider in ("OpenAI", "Groq"):
+        (openai,) = _sdk(provider)
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=GROQ_BASE_URL if provider == "Groq" else None,
+            timeout=LLM_TIMEOUT_S,
+            max_retries=0,
+        )
+
+    # Cliente público da API do Gemini (o mesmo usado pelo google-generativeai),
+    # ligado à chave: sem genai.configure, que é global ao processo
+    (glm,) = _sdk(provider)
+    return glm.GenerativeServiceClient(client_options={"api_key": api_key})
+
+
+def get_client(provider, api_key):
+    """
+    Cliente do provedor para a chave (OpenAI/Groq: openai.OpenAI com conexões
+    HTTP keep-alive; Gemini: GenerativeServiceClient com o canal gRPC). A chave
+    só entra no pool como hash. Clientes que saem do pool não são fechados
+    (podem estar respondendo a outra sessão): o coletor de lixo os libera.
+    """
+    key = (provider, hashlib.sha256(api_key.encode()).hexdigest())
+    pool = _client_pool()
+    with pool["lock"]:
+        clients = pool["clients"]
+        if key in clients:
+            clients.move_to_end(key)
+            return clients[key]
+
+        client = _make_client(provider, api_key)
+        clients[key] = client
+        while len(clients) > MAX_POOLED_CLIENTS:
+            clients.popitem(last=False)
+        return client
+
+
+@st.cache_resource(show_spinner=False)
+def _executor():
+    """Executor limitado e de vida longa, compartilhado por todas as sessões."""
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm"
+    )
+
+
+def _openai_stream(client, model, messages):
+    response = client.chat.completions.create(
+        model=model, messages=messages, temperature=0.3, stream=True
+    )
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _gemini_stream(client, messages):
+    # PRECISA USAR O CHAT SERVICE DO GEMINI PARA MANTER A MEMÓRIA
+    # Vamos simular a passagem de contexto no prompt por simplicidade AGORA, mas
+    # o ideal seria usar o client.chats().send_message() para Gemini.
+    (glm,) = _sdk("Gemini")
+    context_prompt = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+    request = glm.GenerateContentRequest(
+        model=f"models/{GEMINI_MODEL}",
+        contents=[glm.Content(role="user", parts=[glm.Part(text=context_prompt)])],
+    )
+    # Sem retentativas do SDK: quem repete e troca de provedor é o roteador
+    response = client.stream_generate_content(
+        request=request, retry=None, timeout=LLM_TIMEOUT_S
+    )
+    for chunk in response:
+        for candidate in chunk.candidates[:1]:
+            text = "".join(part.text for part in candidate.content.parts)
+            if text:
+                yield text
+
+
+def _candidate(provider, api_key, model_name, messages):
+    """Candidato do roteador para o provedor, ou None se ele não puder ser usado."""
+    model = _model_for(provider, model_name)
+    if provider == "Mock":
+        if not MOCK_ENABLED:
+            return None
+        return Candidate(provider, model, lambda: mock_stream(messages))
+    if not api_key:
+        return None
+
+    if _sdk(provider) is None:
+        return None
+
+    if provider in ("OpenAI", "Groq"):
+        client = get_client(provider, api_key)
+        return Candidate(
+            provider, model, lambda: _openai_stream(client, model, messages)
+        )
+    if provider == "Gemini":
+        client = get_client(provider, api_key)
+        return Candidate(provider, model, lambda: _gemini_stream(client, messages))
+    return None
+
+
+def stream_response(
+    prompt,
+    chat_history,
+    dataset_summary,
+    api_key,
+    provider,
+    model_name=None,
+    profile=None,
+    fallbacks=(),
+    hedge=False,
+    state=None,
+    memories=None,
+):
+    """
+    Gera a resposta do modelo em pedaços de texto, à medida que chegam
+    (OpenAI, Groq e Gemini em modo streaming, ou o provedor local "Mock").
+
+    O roteador tenta o provedor escolhido com retentativas e, se ele falhar
+    antes do primeiro token, passa para os `fallbacks` [(provedor, chave)]
+    (o "Mock" só responde quando é o escolhido, nunca como failover).
+    Com `hedge`, um pedido duplicado vai ao segundo provedor quando o
+    primeiro passa do seu p95. Erros viram uma mensagem amigável no fluxo
+    (mesmo depois de um texto parcial) e marcam `state["error"]`;
+    `state["provider"]` diz quem respondeu. `memories` são interações antigas
+    parecidas com a pergunta, incluídas no contexto.
+    """
+    if state is None:
+        state = {}
+    if not provider or (not api_key and provider != "Mock"):
+        state["error"] = True
+        yield "⚠️ Configure o provedor e insira a chave da API antes de usar o chat."
+        return
 
-        if "insufficient_quota" in erro_str or "429" in erro_str:
-            return "⚠️ Erro de cota/limite de uso excedido. Verifique seu plano na API do provedor."
-        elif "API key is not valid" in erro_str or "401" in erro_str:
-            return "⚠️ Erro de autenticação. A API Key inserida é inválida."
+    candidates = []
+    fallbacks = [(name, key) for name, key in fallbacks if name != "Mock"]
+    for name, key in [(provider, api_key), *fallbacks]:
+        # Contexto montado com o orçamento de tokens de cada provedor
+        messages = _build_messages(
+            prompt, chat_history, dataset_summary, name, profile, memories
+        )
+        candidate = _candidate(name, key, model_name, messages)
+        if candidate is not None:
+            candidates.append(candidate)
+
+    if not candidates:
+        state["error"] = True
+        yield "⚠️ Nenhum provedor válido configurado ou biblioteca ausente."
+        return
 
-        return f"⚠️ Erro ao conectar à API: {e}"
+    try:
+        yield from route_stream(candidates, hedge=hedge, state=state)
+    except Exception as e:
+        state["error"] = True
+        yield _friendly_error(e)
 
 
 # ==========================================
-# ⚙️ Execução Assíncrona
+# ⏱️ Latência por provedor
 # ==========================================
-def generate_response_async(*args, **kwargs):
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(generate_response, *args, **kwargs)
-        return future.result()
+def timed_stream(stream, provider, state=None):
+    """
+    Repassa os pedaços do stream medindo o tempo até o primeiro token e o
+    tempo total; a medição fica em st.session_state["llm_latency"][provider].
+    Com `state` (o do roteador), vale o provedor que de fato respondeu.
+    """
+    start = time.perf_counter()
+    first_token = None
+    for chunk in stream:
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        yield chunk
+    total = time.perf_counter() - start
+    if state:
+        provider = state.get("provider", provider)
+
+    history = st.session_state.setdefault("llm_latency", {}).setdefault(
+        provider, deque(maxlen=LATENCY_HISTORY)
+    )
+    history.append(
+        {"ttft": first_token if first_token is not None else total, "total": total}
+    )
 
 
 # ==========================================
@@ -160,42 +439,107 @@ def render_chat(
     api_key=None,
     provider=None,
 ):
-    """Chat IA com spinner leve e seguro (sem overlay bloqueante)."""
+    """Chat IA com resposta em streaming (sem overlay bloqueante)."""
     initialize_memory()
 
-    if not provider or not api_key:
+    if not provider or (not api_key and provider != "Mock"):
         st.warning("⚠️ Configure o provedor e a API Key para usar o chat.")
         return
+    preload_provider(provider)
+
+    cache_stats = response_cache.stats()
+    st.metric(
+        "⚡ Acerto do cache de respostas",
+        f"{cache_stats['hit_rate']:.0%}",
+        help=f"{cache_stats['hits']} acertos, {cache_stats['misses']} faltas",
+    )
+    provider_table = stats_table()
+    if not provider_table.empty:
+        with st.expander("📶 Desempenho dos provedores"):
+            st.dataframe(provider_table.style.format(precision=2))
 
     show_history()
     user_input = st.chat_input("Digite sua pergunta sobre os dados...")
     if not user_input:
         return
 
+    # Histórico anterior à pergunta (a pergunta vai como a última mensagem)
+    history = list(st.session_state["chat_history"])
     add_to_history("user", user_input)
 
-    # Spinner embutido no chat (sem overlay global)
+    model_name = st.session_state.get("groq_model", "llama-3.2-8b-text-preview")
+    # No modo streaming só há uma amostra: o contexto vem do sumário do arquivo
+    profile = None if "stream_info" in st.session_state else get_profile(data)
+    # Outros provedores com chave salva entram como failover, na ordem salva
+    fallbacks = [
+        (name, key)
+        for name, key in st.session_state.get("api_keys", {}).items()
+        if name != provider and key
+    ]
+    route = {}
+    key = _response_key(user_input, history, provider, model_name)
+    cached = response_cache.get(key)
+
+    # Resposta exibida token a token dentro da mensagem do assistente
     with st.chat_message("assistant"):
-        with st.spinner("🤖 Processando sua pergunta com IA..."):
+        if cached is not None:
+            resposta = cached
+            st.markdown(resposta)
+            st.caption("⚡ Resposta do cache (mesma pergunta sobre este dataset)")
+        else:
             try:
-                # ❗ APENAS ESTE BLOCO É ALTERADO PARA INCLUIR O HISTÓRICO
-                resposta = generate_response_async(
+                stream = stream_response(
                     user_input,
-                    st.session_state["chat_history"],  # <-- NOVO: Histórico do chat
+                    history,
                     dataset_summary,
                     api_key,
                     provider,
-                    model_name=st.session_state.get(
-                        "groq_model", "llama-3.2-8b-text-preview"
-                    ),
+                    model_name=model_name,
+                    profile=profile,
+                    fallbacks=fallbacks,
+                    hedge=st.session_state.get("llm_hedge", False),
+                    state=route,
+                    memories=_relevant_memories(user_input),
                 )
+                resposta = st.write_stream(timed_stream(stream, provider, route))
             except Exception as e:
+                route["error"] = True
                 resposta = f"⚠️ Erro: {e}"
+                st.markdown(resposta)
+
+            if not isinstance(resposta, str):
+                resposta = "".join(map(str, resposta))
+            resposta = resposta.strip()
+            answered_by = route.get("provider", provider)
+            # Só guarda o que o provedor escolhido respondeu: a chave é dele,
+            # e uma resposta de failover/hedge não deve passar pela dele
+            if resposta and not route.get("error") and answered_by == provider:
+                response_cache.put(key, resposta)
+
+            if answered_by != provider:
+                st.caption(f"🔀 Respondido por {answered_by} (failover)")
+
+            latency = st.session_state.get("llm_latency", {}).get(answered_by)
+            if latency:
+                st.caption(
+                    f"⏱️ Primeiro token: {latency[-1]['ttft']:.2f}s · "
+                    f"total: {latency[-1]['total']:.2f}s"
+                )
 
-            st.markdown(resposta)
-            add_to_history("assistant", resposta)
+        add_to_history("assistant", resposta)
+        # Respostas com erro (inclusive texto parcial) não viram memória
+        if route.get("error"):
+            return
 
         try:
-            salvar_memoria(user_input, resposta, tipo_analise="chat")
+            # Gravação em lote, em segundo plano (não segura a resposta)
+            file_hash, usuario = _memory_scope()
+            salvar_memoria_async(
+                user_input,
+                resposta,
+                tipo_analise="chat",
+                file_hash=file_hash,
+                usuario=usuario,
+            )
         except Exception as e:
             st.warning(f"⚠️ Erro ao salvar na memória: {e}")
@@ -1,42 +1,118 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
-from utils.plot_utils import apply_blue_theme
+from utils.plot_utils import apply_blue_theme, cached_plot
+from utils.pagination import paginate_columns
+from src.analysis.profile import get_profile
 import pandas as pd
 
+# Número de células (linhas x colunas) processadas por bloco de linhas
+ROW_BLOCK_CELLS = 8_000_000
 
-# Função cacheada
-@st.cache_data
-def analyze_and_plot_anomalies(data: pd.DataFrame, numeric_cols: list):
-    """Realiza os cálculos de outliers e gera todos os boxplots, cacheados."""
-    summaries = []
+
+def _scan_outliers(data: pd.DataFrame, profile, cols: list, with_rows: bool):
+    """
+    Detecta outliers (IQR e Z-Score > 3) em todas as colunas de `cols` de uma vez,
+    sobre uma matriz 2-D float percorrida em blocos de linhas.
+
+    Retorna as contagens por coluna e, se `with_rows`, as máscaras por linha
+    (alguma coluna fora dos limites).
+    """
+    position = {col: i for i, col in enumerate(profile.numeric_cols)}
+    idx = [position[col] for col in cols]
+
+    # Limites vetorizados a partir do perfil (quartis, média e desvio populacional)
+    q1 = profile.quantile(0.25, cols).to_numpy()
+    q3 = profile.quantile(0.75, cols).to_numpy()
+    iqr = q3 - q1
+    lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    mean = profile.stats.mean[idx]
+    z_limit = 3 * profile.stats.std_pop[idx]
+
+    n_rows = len(data)
+    iqr_counts = np.zeros(len(cols), dtype=np.int64)
+    z_counts = np.zeros(len(cols), dtype=np.int64)
+    if with_rows:
+        iqr_rows = np.zeros(n_rows, dtype=bool)
+        z_rows = np.zeros(n_rows, dtype=bool)
+
+    numeric = data[cols]
+    step = max(1, ROW_BLOCK_CELLS // max(len(cols), 1))
+    for start in range(0, n_rows, step):
+        block = numeric.iloc[start : start + step].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        # Comparações com NaN são falsas: nulos nunca viram outliers
+        with np.errstate(invalid="ignore"):
+            iqr_mask = (block < lower) | (block > upper)
+            z_mask = np.abs(block - mean) > z_limit
+
+        iqr_counts += iqr_mask.sum(axis=0)
+        z_counts += z_mask.sum(axis=0)
+        if with_rows:
+            iqr_rows[start : start + step] = iqr_mask.any(axis=1)
+            z_rows[start : start + step] = z_mask.any(axis=1)
+
+    result = {
+        "summary": pd.DataFrame(
+            {"Variável": cols, "Outliers IQR": iqr_counts, "Z-Score": z_counts}
+        )
+    }
+    if with_rows:
+        iqr_rows.flags.writeable = False
+        z_rows.flags.writeable = False
+        result.update(iqr_rows=iqr_rows, z_rows=z_rows)
+    return result
+
+
+# Contagens por página de colunas (pequenas: uma entrada por página já vista)
+@st.cache_resource(show_spinner=False, max_entries=32)
+def detect_outliers(file_hash: str, _data: pd.DataFrame, _profile, numeric_cols: list):
+    """Contagens de outliers (IQR e Z-Score) por coluna, sem máscaras por linha."""
+    return _scan_outliers(_data, _profile, list(numeric_cols), with_rows=False)
+
+
+# Máscaras por linha (n_linhas booleanos cada): só para a exportação, um dataset
+@st.cache_resource(show_spinner=False, max_entries=1)
+def outlier_masks(file_hash: str, _data: pd.DataFrame, _profile, numeric_cols: list):
+    """Contagens e máscaras por linha de todas as colunas, prontas para exportação."""
+    return _scan_outliers(_data, _profile, list(numeric_cols), with_rows=True)
+
+
+def analyze_and_plot_anomalies(
+    file_hash: str, data: pd.DataFrame, profile, numeric_cols: list
+):
+    """Realiza os cálculos de outliers e gera todos os boxplots, cacheados por dataset."""
+    outliers = detect_outliers(file_hash, data, profile, numeric_cols)
     plots = {}
 
     for col in numeric_cols:
-        # --- 1. Cálculo de Outliers ---
-        Q1, Q3 = data[col].quantile([0.25, 0.75])
-        IQR = Q3 - Q1
-        lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
-        outliers = ((data[col] < lower) | (data[col] > upper)).sum()
-
-        # O Z-Score precisa de dados não-nulos
-        z_outliers = (np.abs(stats.zscore(data[col].dropna())) > 3).sum()
-        summaries.append(
-            {"Variável": col, "Outliers IQR": outliers, "Z-Score": z_outliers}
+        # Boxplot renderizado em PNG e guardado no cache de imagens (LRU)
+        plots[col] = cached_plot(
+            (file_hash, "boxplot", col), lambda col=col: _draw_boxplot(data, col)
         )
 
-        # --- 2. Geração do Boxplot ---
-        fig, ax = plt.subplots(figsize=(14, 7))
-        ax.boxplot(
-            data[col].dropna(),
-            patch_artist=True,
-            boxprops=dict(facecolor="#0099FF", alpha=0.6),
-        )
-        ax.set_title(col)
-        plots[col] = fig
+    return outliers["summary"].to_dict("records"), plots
+
+
+def _draw_boxplot(data: pd.DataFrame, col: str):
+    fig, ax = plt.subplots(figsize=(14, 7))
+    ax.boxplot(
+        data[col].dropna(),
+        patch_artist=True,
+        boxprops=dict(facecolor="#0099FF", alpha=0.6),
+    )
+    ax.set_title(col)
+    return fig
 
-    return summaries, plots
+
+def outlier_rows_csv(data: pd.DataFrame, outliers: dict) -> bytes:
+    """CSV com as linhas marcadas como outlier (IQR ou Z-Score) e os flags por método."""
+    flagged = outliers["iqr_rows"] | outliers["z_rows"]
+    export = data.loc[flagged].copy()
+    export.insert(0, "outlier_iqr", outliers["iqr_rows"][flagged])
+    export.insert(1, "outlier_zscore", outliers["z_rows"][flagged])
+    return export.to_csv(index_label="linha").encode("utf-8")
 
 
 def render(data, numeric_cols):
@@ -47,17 +123,40 @@ def render(data, numeric_cols):
         st.info("Sem variáveis numéricas.")
         return
 
+    file_hash = st.session_state.get("file_hash")
+    profile = get_profile(data)
+
+    # Só a página visível é calculada e renderizada (páginas já vistas vêm do cache)
+    visible_cols = paginate_columns(numeric_cols, key="anomalies")
+    if not visible_cols:
+        return
+
     # CHAMA FUNÇÃO CACHEADA
-    summaries, plots = analyze_and_plot_anomalies(data, numeric_cols)
+    summaries, plots = analyze_and_plot_anomalies(
+        file_hash, data, profile, visible_cols
+    )
 
     # Exibe a tabela de resumo
     st.dataframe(summaries)
 
+    # Exportação das linhas com outliers em todas as colunas (calculada só sob demanda)
+    if st.checkbox("📥 Preparar exportação das linhas com outliers"):
+        outliers = outlier_masks(file_hash, data, profile, numeric_cols)
+        n_flagged = int((outliers["iqr_rows"] | outliers["z_rows"]).sum())
+        st.caption(f"{n_flagged} linhas com ao menos um outlier (IQR ou Z-Score).")
+        if n_flagged:
+            st.download_button(
+                "Baixar CSV",
+                data=outlier_rows_csv(data, outliers),
+                file_name="outliers.csv",
+                mime="text/csv",
+            )
+
     st.subheader("Boxplots")
 
     # Exibe todos os plots do cache
-    for fig in plots.values():
-        st.pyplot(fig)
+    for image in plots.values():
+        st.image(image, width="stretch")
         st.markdown(
             "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>",
             unsafe_allow_html=True,
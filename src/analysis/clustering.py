@@ -1,40 +1,290 @@
 # DEPOIS (clustering.py)
 
+import threading
+from collections import OrderedDict
+
 import streamlit as st
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-from utils.plot_utils import apply_blue_theme
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+from utils.plot_utils import apply_blue_theme, cached_plot
 import numpy as np
+import pandas as pd
+
+# Acima deste número de linhas o modo para grandes volumes é sugerido
+LARGE_DATA_ROWS = 100_000
+# Linhas amostradas para ajustar o modelo no modo para grandes volumes
+FIT_SAMPLE_ROWS = 200_000
+# Linhas amostradas para o silhouette e para o gráfico de dispersão
+SILHOUETTE_SAMPLE_ROWS = 10_000
+PLOT_SAMPLE_ROWS = 20_000
+# Linhas padronizadas e rotuladas por vez ao aplicar o modelo a todo o dataset
+PREDICT_BLOCK_ROWS = 262_144
+# Faixa de k do slider (e da varredura)
+K_VALUES = range(2, 11)
+# Limites do cache de modelos do processo
+MAX_CACHED_FITS = 64
+MAX_CACHED_FEATURES = 4
+
+
+def _feature_matrix(data, numeric_cols):
+    """Matriz float32 das linhas completas e as posições dessas linhas no dataset."""
+    values = data[numeric_cols].to_numpy(dtype=np.float32, na_value=np.nan)
+    rows = np.flatnonzero(~np.isnan(values).any(axis=1))
+    return values[rows], rows
+
+
+def _fit_sample(X, seed=42):
+    """Amostra (determinística) usada para ajustar o modelo no modo para grandes volumes."""
+    if len(X) <= FIT_SAMPLE_ROWS:
+        return X
+    rng = np.random.default_rng(seed)
+    return X[rng.choice(len(X), FIT_SAMPLE_ROWS, replace=False)]
+
+
+def _fit_kmeans(X, n_clusters, large_mode, init=None, scaler=None, seed=42):
+    """
+    Ajusta o K-Means e devolve um dicionário com rótulos (int8), centróides
+    na escala original, centróides no espaço do ajuste, inércia e scaler.
+    No modo para grandes volumes: padroniza as colunas, ajusta um
+    MiniBatchKMeans numa amostra e só então rotula todas as linhas.
+    `init` recebe centróides iniciais (warm start) no espaço do ajuste.
+    """
+    n_init = 1 if init is not None else None
+    if not large_mode:
+        kmeans = KMeans(
+            n_clusters=n_clusters,
+            init="k-means++" if init is None else init,
+            n_init=n_init or 10,
+            random_state=seed,
+        )  # random_state para reprodutibilidade
+        labels = kmeans.fit_predict(X)
+        centers = kmeans.cluster_centers_
+    else:
+        sample = _fit_sample(X, seed)
+        scaler = scaler or StandardScaler().fit(sample)
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init="k-means++" if init is None else init,
+            batch_size=4096,
+            n_init=n_init or 3,
+            random_state=seed,
+        ).fit(scaler.transform(sample))
+        labels = _predict_blocks(kmeans, scaler, X)
+        # Centróides de volta à escala original (para o gráfico)
+        centers = scaler.inverse_transform(kmeans.cluster_centers_)
+
+    return {
+        "labels": labels.astype(np.int8),
+        "centers": centers,
+        "fit_centers": kmeans.cluster_centers_,
+        "inertia": kmeans.inertia_,
+        "scaler": scaler,
+    }
+
+
+def _predict_blocks(kmeans, scaler, X):
+    """Rótulos de todas as linhas, padronizando um bloco por vez (sem cópia de X)."""
+    labels = np.empty(len(X), dtype=np.int8)
+    for start in range(0, len(X), PREDICT_BLOCK_ROWS):
+        block = X[start : start + PREDICT_BLOCK_ROWS]
+        labels[start : start + len(block)] = kmeans.predict(scaler.transform(block))
+    return labels
+
+
+def _silhouette(X, labels, scaler=None, seed=42):
+    """Silhouette numa amostra: só as linhas sorteadas são padronizadas."""
+    if len(X) > SILHOUETTE_SAMPLE_ROWS:
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(X), SILHOUETTE_SAMPLE_ROWS, replace=False)
+        X, labels = X[rows], labels[rows]
+    if scaler is not None:
+        X = scaler.transform(X)
+    return silhouette_score(X, labels)
+
+
+def _fit_and_score(X, n_clusters, large_mode):
+    fit = _fit_kmeans(X, n_clusters, large_mode)
+    fit["silhouette"] = _silhouette(X, fit["labels"], fit["scaler"])
+    return fit
+
+
+# ==========================================
+# 🗃️ Cache de modelos ajustados (compartilhado entre sessões)
+# ==========================================
+@st.cache_resource(show_spinner=False)
+def _model_registry():
+    """Modelos por (hash, colunas, modo, k) e matrizes por (hash, colunas), em LRU."""
+    return {
+        "fits": OrderedDict(),
+        "features": OrderedDict(),
+        "lock": threading.Lock(),
+    }
+
+
+def _remember(store: OrderedDict, key, value, max_entries):
+    store[key] = value
+    store.move_to_end(key)
+    while len(store) > max_entries:
+        store.popitem(last=False)
+
 
+def _features(file_hash, data, numeric_cols):
+    """Matriz de features cacheada por dataset/colunas (reutilizada por todos os k)."""
+    registry = _model_registry()
+    key = (file_hash, tuple(numeric_cols))
+    with registry["lock"]:
+        if key in registry["features"]:
+            registry["features"].move_to_end(key)
+            return registry["features"][key]
+    features = _feature_matrix(data, numeric_cols)
+    with registry["lock"]:
+        _remember(registry["features"], key, features, MAX_CACHED_FEATURES)
+    return features
 
-# NOVO BLOCO (Função cacheada)
-@st.cache_data
-def run_kmeans_and_plot(data, numeric_cols, n_clusters):
-    """Executa o K-Means e gera o plot uma única vez por combinação de dados/k."""
-    X = data[numeric_cols].dropna()
 
-    kmeans = KMeans(
-        n_clusters=n_clusters, n_init=10, random_state=42
-    )  # random_state para reprodutibilidade
-    clusters = kmeans.fit_predict(X)
+def _warm_start(X, neighbour, n_clusters, large_mode, seed=42):
+    """
+    Centróides iniciais para k a partir da solução vizinha já ajustada:
+    - vizinho com menos clusters: mantém os centróides e acrescenta os pontos
+      mais distantes deles (amostragem D², como no k-means++);
+    - vizinho com mais clusters: mantém os centróides dos maiores clusters.
+    """
+    centers = neighbour["fit_centers"]
+    if len(centers) > n_clusters:
+        sizes = np.bincount(neighbour["labels"], minlength=len(centers))
+        return centers[np.argsort(sizes)[::-1][:n_clusters]]
 
-    # Criação do DataFrame de exibição (apenas as 5 primeiras linhas para não ser pesado)
-    df_preview = data.copy()
-    df_preview["Cluster"] = clusters
+    rng = np.random.default_rng(seed)
+    points = _fit_sample(X, seed)
+    if large_mode:
+        points = neighbour["scaler"].transform(points)
+    points = points[rng.choice(len(points), min(len(points), 10_000), replace=False)]
+
+    centers = list(centers)
+    while len(centers) < n_clusters:
+        dist = ((points[:, None, :] - np.asarray(centers)[None]) ** 2).sum(-1).min(1)
+        total = dist.sum()
+        # Todos os pontos já coincidem com centróides: sorteio uniforme
+        weights = dist / total if total > 0 and np.isfinite(total) else None
+        centers.append(points[rng.choice(len(points), p=weights)])
+    return np.asarray(centers)
+
+
+def get_kmeans_fit(file_hash, data, numeric_cols, n_clusters, large_mode=False):
+    """
+    Modelo ajustado para (dataset, colunas, modo, k). k já ajustados são
+    consulta direta; um k novo parte do vizinho mais próximo já ajustado.
+    """
+    registry = _model_registry()
+    base = (file_hash, tuple(numeric_cols), large_mode)
+    with registry["lock"]:
+        fits = registry["fits"]
+        if base + (n_clusters,) in fits:
+            fits.move_to_end(base + (n_clusters,))
+            return fits[base + (n_clusters,)]
+        fitted_k = [key[-1] for key in fits if key[:-1] == base]
+        neighbour = None
+        if fitted_k:
+            nearest = min(fitted_k, key=lambda k: (abs(k - n_clusters), k))
+            neighbour = fits[base + (nearest,)]
+
+    X, rows = _features(file_hash, data, numeric_cols)
+    if neighbour is not None:
+        fit = _fit_kmeans(
+            X,
+            n_clusters,
+            large_mode,
+            init=_warm_start(X, neighbour, n_clusters, large_mode),
+            scaler=neighbour["scaler"],
+        )
+    else:
+        fit = _fit_kmeans(X, n_clusters, large_mode)
+    fit["rows"] = rows
+
+    with registry["lock"]:
+        _remember(registry["fits"], base + (n_clusters,), fit, MAX_CACHED_FITS)
+    return fit
+
+
+def sweep_kmeans(file_hash, data, numeric_cols, large_mode=False):
+    """
+    Ajusta todos os k do slider em paralelo e guarda rótulos, centróides,
+    inércia e silhouette no cache de modelos: depois disso, mover o slider
+    é só uma consulta.
+    """
+    registry = _model_registry()
+    base = (file_hash, tuple(numeric_cols), large_mode)
+    with registry["lock"]:
+        missing = [
+            k
+            for k in K_VALUES
+            if "silhouette" not in registry["fits"].get(base + (k,), {})
+        ]
+
+    if missing:
+        X, rows = _features(file_hash, data, numeric_cols)
+        results = Parallel(n_jobs=-1)(
+            delayed(_fit_and_score)(X, k, large_mode) for k in missing
+        )
+        with registry["lock"]:
+            for k, fit in zip(missing, results):
+                fit["rows"] = rows
+                _remember(registry["fits"], base + (k,), fit, MAX_CACHED_FITS)
+
+    with registry["lock"]:
+        fits = {k: registry["fits"][base + (k,)] for k in K_VALUES}
+    scores = pd.DataFrame(
+        {
+            "k": list(K_VALUES),
+            "Inércia": [fits[k]["inertia"] for k in K_VALUES],
+            "Silhouette": [fits[k]["silhouette"] for k in K_VALUES],
+        }
+    ).set_index("k")
+    return fits, scores
+
+
+def run_kmeans_and_plot(file_hash, data, numeric_cols, n_clusters, large_mode=False):
+    """Executa o K-Means e gera o plot (PNG no cache de imagens) por combinação de dados/k."""
+    fit = get_kmeans_fit(file_hash, data, numeric_cols, n_clusters, large_mode)
+    labels, centers, rows = fit["labels"], fit["centers"], fit["rows"]
+
+    # Prévia sem copiar o dataset: só as 5 primeiras linhas usadas no ajuste
+    df_preview = data[numeric_cols].iloc[rows[:5]]
+    df_preview.insert(0, "Cluster", labels[:5])
+
+    image = cached_plot(
+        (file_hash, "kmeans", tuple(numeric_cols), n_clusters, large_mode, id(fit)),
+        lambda: _draw_clusters(data, numeric_cols, rows, labels, centers),
+    )
+    return image, df_preview
+
+
+def _draw_clusters(data, numeric_cols, rows, labels, centers):
+    # Dispersão de uma amostra das linhas (o gráfico não precisa de milhões de pontos)
+    if len(rows) > PLOT_SAMPLE_ROWS:
+        pick = np.random.default_rng(42).choice(
+            len(rows), PLOT_SAMPLE_ROWS, replace=False
+        )
+        rows, labels = rows[pick], labels[pick]
+    x = data[numeric_cols[0]].to_numpy()[rows]
+    y = data[numeric_cols[1]].to_numpy()[rows]
 
     # Criação do Plot Matplotlib
     fig, ax = plt.subplots(figsize=(14, 7))  # largura x altura em polegadas
-    ax.scatter(X.iloc[:, 0], X.iloc[:, 1], c=clusters, cmap="Blues", alpha=0.7)
+    ax.scatter(x, y, c=labels, cmap="Blues", alpha=0.7)
     ax.scatter(
-        kmeans.cluster_centers_[:, 0],
-        kmeans.cluster_centers_[:, 1],
+        centers[:, 0],
+        centers[:, 1],
         s=200,
         color="black",
         marker="x",
     )
     ax.set_title("Visualização de Clusters")
 
-    return fig, df_preview[["Cluster"] + numeric_cols].head()
+    return fig
 
 
 def render(data, numeric_cols):
@@ -45,14 +295,37 @@ def render(data, numeric_cols):
         st.info("É necessário ao menos duas variáveis numéricas para clusterização.")
         return
 
-    n_clusters = st.slider("Número de Clusters (k)", 2, 10, 3)
+    file_hash = st.session_state.get("file_hash")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        large_mode = st.toggle(
+            "⚡ Modo para grandes volumes (MiniBatch + amostragem + padronização)",
+            value=len(data) > LARGE_DATA_ROWS,
+            key="kmeans_large_mode",
+        )
+    with col2:
+        run_sweep = st.toggle(
+            "🔁 Calcular k=2..10 de uma vez (todos os núcleos)",
+            value=False,
+            key="kmeans_sweep",
+        )
+
+    n_clusters = st.slider("Número de Clusters (k)", K_VALUES[0], K_VALUES[-1], 3)
+
+    if run_sweep:
+        with st.spinner("Ajustando k=2..10 em paralelo..."):
+            _, scores = sweep_kmeans(file_hash, data, numeric_cols, large_mode)
+        st.dataframe(scores.style.highlight_max(subset=["Silhouette"]))
 
     # CHAMADA À FUNÇÃO CACHEADA
-    fig, df_preview = run_kmeans_and_plot(data, numeric_cols, n_clusters)
+    image, df_preview = run_kmeans_and_plot(
+        file_hash, data, numeric_cols, n_clusters, large_mode
+    )
 
     st.dataframe(df_preview)  # Exibe o dataframe retornado da função cacheada
 
-    st.pyplot(fig)  # Exibe o plot retornado da função cacheada
+    st.image(image, width="stretch")  # Exibe o PNG retornado do cache
 
     st.markdown(
         "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>", unsafe_allow_html=True
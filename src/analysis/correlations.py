@@ -1,16 +1,117 @@
 import streamlit as st
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import seaborn as sns
-from utils.plot_utils import apply_blue_theme
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+from utils.plot_utils import apply_blue_theme, cached_plot
+from src.analysis.profile import get_profile
+from src.running_stats import CoMoments
 
+# Colunas ordenadas (postos) por bloco (limita a memória temporária)
+COLUMN_BLOCK = 256
+# Acima deste número de colunas o heatmap mostra só as colunas dos pares mais fortes
+HEATMAP_MAX_COLS = 40
+# Valores escritos nas células só em matrizes pequenas
+ANNOTATE_MAX_COLS = 15
+TOP_PAIRS = 20
 
-# Função cacheada
-@st.cache_data
-def generate_correlation_heatmap(data, numeric_cols):
-    """Calcula a correlação e gera o heatmap uma única vez por dataset."""
-    corr = data[numeric_cols].corr()  # CÁLCULO FEITO APENAS NA 1ª VEZ
+METHODS = {"Pearson": "pearson", "Spearman (postos)": "spearman"}
+
+
+def _rank_matrix(data, numeric_cols):
+    """Postos (float32) de cada coluna, calculados uma única vez, bloco a bloco."""
+    ranks = np.empty((len(data), len(numeric_cols)), dtype=np.float32)
+    for start in range(0, len(numeric_cols), COLUMN_BLOCK):
+        block = data[numeric_cols[start : start + COLUMN_BLOCK]]
+        ranks[:, start : start + COLUMN_BLOCK] = block.rank(method="average")
+    return ranks
+
+
+# Função cacheada (matriz compartilhada pelas sessões do processo, sem cópia)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def correlation_matrix(
+    file_hash: str, _data: pd.DataFrame, numeric_cols: list, method: str = "pearson"
+) -> pd.DataFrame:
+    """
+    Correlação de Pearson ou Spearman a partir de co-momentos calculados com
+    produtos de matrizes float32 (BLAS) em faixas de colunas. No Pearson os
+    co-momentos vêm do perfil do dataset, que os atualiza ao anexar dados.
+    Cada par usa só as linhas em que as duas colunas estão preenchidas.
+    """
+    cols = list(numeric_cols)
+    if method == "spearman":
+        corr = CoMoments.from_array(cols, _rank_matrix(_data, cols)).corr()
+    else:
+        moments = get_profile(_data).comoments(_data)
+        position = {col: i for i, col in enumerate(moments.columns)}
+        idx = [position[col] for col in cols]
+        corr = moments.corr()[np.ix_(idx, idx)]
+
+    corr = corr.astype(np.float32)
+    corr.flags.writeable = False
+    return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def top_correlated_pairs(corr: pd.DataFrame, k: int = TOP_PAIRS) -> pd.DataFrame:
+    """Os k pares de colunas distintas com maior |correlação|."""
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(values), k=1)
+    strength = np.nan_to_num(np.abs(values[i, j]), nan=-1.0)
+    k = min(k, len(strength))
+    best = np.argpartition(strength, -k)[-k:] if k else np.array([], dtype=int)
+    best = best[np.argsort(strength[best])[::-1]]
+    return pd.DataFrame(
+        {
+            "Variável A": corr.index[i[best]],
+            "Variável B": corr.columns[j[best]],
+            "Correlação": values[i[best], j[best]],
+        }
+    )
+
+
+def heatmap_columns(corr: pd.DataFrame, pairs: pd.DataFrame) -> list:
+    """
+    Colunas do heatmap: todas, se couberem; senão as dos pares mais fortes.
+    Ordenadas por agrupamento hierárquico (1 - |r|) para formar blocos visíveis.
+    """
+    cols = list(corr.columns)
+    if len(cols) > HEATMAP_MAX_COLS:
+        picked = pd.unique(pairs[["Variável A", "Variável B"]].to_numpy().ravel())
+        cols = list(picked[:HEATMAP_MAX_COLS])
+    if len(cols) < 3:
+        return cols
+
+    sub = np.nan_to_num(np.abs(corr.loc[cols, cols].to_numpy(dtype=np.float64)))
+    distance = 1.0 - sub
+    np.fill_diagonal(distance, 0.0)
+    order = leaves_list(linkage(squareform(distance, checks=False), "average"))
+    return [cols[i] for i in order]
+
+
+# Heatmap renderizado em PNG e guardado no cache de imagens (LRU)
+def generate_correlation_heatmap(file_hash, data, numeric_cols, method="pearson"):
+    """Calcula a correlação e gera o heatmap uma única vez por dataset/método."""
+    corr = correlation_matrix(file_hash, data, numeric_cols, method)
+    pairs = top_correlated_pairs(corr)
+    image = cached_plot(
+        (file_hash, "correlation", tuple(numeric_cols), method),
+        lambda: _draw_correlation_heatmap(corr, heatmap_columns(corr, pairs)),
+    )
+    return image, pairs
+
+
+def _draw_correlation_heatmap(corr, cols):
+    sub = corr.loc[cols, cols]
     fig, ax = plt.subplots(figsize=(14, 7))  # largura x altura em polegadas
-    sns.heatmap(corr, cmap="Blues", annot=True, fmt=".2f", ax=ax)
+    sns.heatmap(
+        sub,
+        cmap="Blues",
+        annot=len(cols) <= ANNOTATE_MAX_COLS,
+        fmt=".2f",
+        ax=ax,
+    )
     ax.set_title("Matriz de Correlação")
 
     return fig
@@ -24,10 +125,22 @@ def render(data, numeric_cols):
         st.info("É necessário ao menos duas variáveis numéricas.")
         return
 
+    method = METHODS[st.radio("Método", list(METHODS), horizontal=True)]
+
     # CHAMADA À FUNÇÃO CACHEADA
-    fig = generate_correlation_heatmap(data, numeric_cols)
+    image, pairs = generate_correlation_heatmap(
+        st.session_state.get("file_hash"), data, numeric_cols, method
+    )
+
+    if len(numeric_cols) > HEATMAP_MAX_COLS:
+        st.caption(
+            f"{len(numeric_cols)} colunas numéricas: o heatmap mostra só as "
+            "colunas dos pares mais correlacionados, agrupadas por similaridade."
+        )
+    st.image(image, width="stretch")
 
-    st.pyplot(fig)
+    st.subheader(f"🔗 {TOP_PAIRS} pares mais correlacionados")
+    st.dataframe(pairs, hide_index=True)
 
     st.markdown(
         "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>", unsafe_allow_html=True
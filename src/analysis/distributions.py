@@ -1,37 +1,37 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 from utils.plot_utils import apply_blue_theme
+from utils.pagination import paginate_columns
+from src.analysis.profile import get_profile
 import pandas as pd  # <-- Adicionado para tipagem, se necessário
 
 
-# Função cacheada para Histograms - Plots Numéricos
-@st.cache_data
-def generate_numeric_histograms(data: pd.DataFrame, numeric_cols: list):
-    """Gera e armazena em cache todos os gráficos de distribuição numérica."""
-    plots = {}
-    for col in numeric_cols:
-        fig, ax = plt.subplots(figsize=(14, 7))
-        ax.hist(
-            data[col].dropna(),
-            bins=30,
-            color="#007BFF",
-            edgecolor="#FFFFFF",
-            linewidth=1.2,
-            alpha=0.85,
-        )
-        ax.set_title(col)
-        plots[col] = fig
-    return plots
+# Histogramas a partir dos bins do perfil: só ~30 barras por coluna vão ao navegador
+def generate_numeric_histograms(profile, numeric_cols: list):
+    """Monta as tabelas de bins (início do bin -> contagem) de cada coluna numérica."""
+    return {col: histogram_frame(profile, col) for col in numeric_cols}
+
+
+def count_column(col: str) -> str:
+    """Nome da coluna de contagem: nunca coincide com o da coluna de dados."""
+    return f"Frequência ({col})"
+
+
+def histogram_frame(profile, col: str) -> pd.DataFrame:
+    # Bins já contados no perfil do dataset (30 bins, np.histogram vetorizado).
+    # Eixo x = borda inicial do bin, sem arredondar: colunas de escala pequena
+    # (~1e-5) não colapsam em valores repetidos
+    counts, edges = profile.histograms[col]
+    return pd.DataFrame({col: edges[:-1], count_column(col): counts})
 
 
 # Função cacheada para Bar Charts
 @st.cache_data
-def generate_categorical_bar_charts(data: pd.DataFrame, categorical_cols: list):
+def generate_categorical_bar_charts(file_hash: str, _profile, categorical_cols: list):
     """Gera e armazena em cache todos os gráficos de distribuição categórica."""
     charts = {}
-    for col in categorical_cols[:5]:  # Mantendo o limite de 5
+    for col in categorical_cols:  # Apenas as colunas da página visível
         # st.bar_chart usa o objeto ValueCounts, que é seguro para cache.
-        charts[col] = data[col].value_counts().head(10)
+        charts[col] = _profile.top_categories[col].head(10)
     return charts
 
 
@@ -39,13 +39,18 @@ def render(data, numeric_cols, categorical_cols):
     st.header("📊 Distribuições")
     apply_blue_theme()
 
+    file_hash = st.session_state.get("file_hash")
+    profile = get_profile(data)
+
     if numeric_cols:
         st.subheader("Variáveis Numéricas")
 
-        # CHAMA FUNÇÃO CACHEADA E EXIBE PLOTS
-        numeric_plots = generate_numeric_histograms(data, numeric_cols)
-        for fig in numeric_plots.values():
-            st.pyplot(fig)  # AGORA EXIBE O CACHE INSTANTANEAMENTE
+        # LÊ OS BINS DO PERFIL E EXIBE GRÁFICOS LEVES (sem rasterizar no servidor)
+        visible_numeric = paginate_columns(numeric_cols, key="dist_numeric")
+        numeric_bins = generate_numeric_histograms(profile, visible_numeric)
+        for col, bins in numeric_bins.items():
+            st.write(f"#### {col}")
+            st.bar_chart(bins, x=col, y=count_column(col), color="#007BFF")
 
     st.markdown(
         "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>", unsafe_allow_html=True
@@ -55,7 +60,12 @@ def render(data, numeric_cols, categorical_cols):
         st.subheader("Variáveis Categóricas")
 
         # CHAMA FUNÇÃO CACHEADA E EXIBE CHARTS
-        categorical_charts = generate_categorical_bar_charts(data, categorical_cols)
+        visible_categorical = paginate_columns(
+            categorical_cols, key="dist_categorical", default_page_size=5
+        )
+        categorical_charts = generate_categorical_bar_charts(
+            file_hash, profile, visible_categorical
+        )
         for col, chart_data in categorical_charts.items():
             st.write(f"#### {col}")  # Adiciona um título para cada gráfico de barras
             st.bar_chart(chart_data)
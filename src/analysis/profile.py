@@ -0,0 +1,351 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.running_stats import CoMoments, QuantileSketch, RunningStats
+
+# Quantis, bins de histograma e top-k categorias guardados no perfil
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+HIST_BINS = 30
+TOP_K_CATEGORIES = 10
+
+# Colunas numéricas e linhas processadas por vez: a memória temporária fica
+# em COLUMN_BLOCK x ROW_BLOCK valores float64 (64 MB), qualquer que seja o dataset
+COLUMN_BLOCK = 64
+ROW_BLOCK = 131072
+
+# Colunas por faixa no produto de matrizes dos co-momentos
+COMOMENT_BLOCK = 256
+
+# Quantos perfis (datasets) ficam em memória no processo
+MAX_PROFILES = 8
+
+
+class DatasetProfile:
+    """
+    Perfil de colunas calculado uma única vez por dataset (hash do upload).
+
+    Guarda momentos, quantis, nulos, bins de histograma e as categorias mais
+    frequentes. As abas de análise e o Chat IA leem daqui em vez de varrer o
+    DataFrame de novo.
+
+    Tudo o que é guardado é combinável (contagens, somas, co-momentos, bins e
+    sketches de quantis), então anexar linhas novas com `merged(chunk)` custa
+    proporcional ao chunk, não ao dataset.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        self.n_rows = len(data)
+        self.n_cols = data.shape[1]
+        self.dtype_counts = data.dtypes.value_counts().to_dict()
+        self.null_counts = data.isna().sum()
+
+        self.numeric_cols = data.select_dtypes(include=["number"]).columns.tolist()
+        self.categorical_cols = data.select_dtypes(exclude=["number"]).columns.tolist()
+
+        self.stats = RunningStats(self.numeric_cols)
+        self.quantiles = pd.DataFrame(
+            index=pd.Index(PROFILE_QUANTILES), columns=self.numeric_cols, dtype=float
+        )
+        self.sketches = {}
+        self.histograms = {}
+        self.category_counts = {}
+        self.top_categories = {}
+        self.n_unique = {}
+        # Co-momentos (correlação) só são calculados se alguma aba pedir
+        self._comoments = None
+        self._lock = threading.Lock()
+
+        self._profile_numeric(data)
+        self._profile_categorical(data)
+
+    # ------------------------------------------
+    # Construção
+    # ------------------------------------------
+    def _profile_numeric(self, data: pd.DataFrame) -> None:
+        """
+        Uma passada vetorizada por bloco de colunas, em faixas de ROW_BLOCK
+        linhas (momentos e histogramas); quantis ordenando uma coluna por vez.
+        """
+        for start in range(0, len(self.numeric_cols), COLUMN_BLOCK):
+            cols = self.numeric_cols[start : start + COLUMN_BLOCK]
+            frame = data[cols]
+            # Faixa dos histogramas conhecida antes da passada (sem cópia dos dados)
+            lo, hi = _hist_range(
+                frame.min().to_numpy(np.float64), frame.max().to_numpy(np.float64)
+            )
+
+            block_stats = RunningStats(cols)
+            counts = np.zeros((len(cols), HIST_BINS), dtype=np.int64)
+            for rows in _row_blocks(frame):
+                block_stats.merge(RunningStats.from_array(cols, rows))
+                counts += _histogram_counts(rows, lo, hi)
+
+            self.stats.count[start : start + len(cols)] = block_stats.count
+            self.stats.mean[start : start + len(cols)] = block_stats.mean
+            self.stats.m2[start : start + len(cols)] = block_stats.m2
+            self.stats.min[start : start + len(cols)] = block_stats.min
+            self.stats.max[start : start + len(cols)] = block_stats.max
+            for j, col in enumerate(cols):
+                self.histograms[col] = (
+                    counts[j],
+                    np.linspace(lo[j], hi[j], HIST_BINS + 1),
+                )
+                self._profile_order_stats(col, _sorted_values(frame[col]))
+
+    def _profile_order_stats(self, col, ordered: np.ndarray) -> None:
+        """Quantis exatos e sketch a partir dos valores válidos já ordenados."""
+        last = len(ordered) - 1
+        if last >= 0:
+            position = np.multiply(PROFILE_QUANTILES, last)
+            below = np.floor(position).astype(np.int64)
+            above = np.minimum(below + 1, last)
+            low = ordered[below].astype(np.float64)
+            high = ordered[above].astype(np.float64)
+            self.quantiles.loc[:, col] = low + (high - low) * (position - below)
+        else:
+            self.quantiles.loc[:, col] = np.nan
+        self.sketches[col] = QuantileSketch.from_sorted(ordered)
+
+    def _profile_categorical(self, data: pd.DataFrame) -> None:
+        for col in self.categorical_cols:
+            self._set_category_counts(col, data[col].value_counts())
+
+    def _set_category_counts(self, col, counts: pd.Series) -> None:
+        self.category_counts[col] = counts
+        self.n_unique[col] = int((counts > 0).sum())
+        self.top_categories[col] = counts.head(TOP_K_CATEGORIES)
+
+    # ------------------------------------------
+    # Atualização incremental
+    # ------------------------------------------
+    def merged(self, chunk: pd.DataFrame) -> "DatasetProfile":
+        """
+        Novo perfil para (dados atuais + chunk), lendo só as linhas do chunk.
+        O perfil original não é alterado (pode estar em uso por outra sessão).
+        Os quantis passam a vir dos sketches (aproximados). O chunk deve ser a
+        fatia nova do dataset combinado (tipos já promovidos na concatenação).
+        """
+        profile = copy.copy(self)
+        profile._lock = threading.Lock()
+        profile.n_rows = self.n_rows + len(chunk)
+        profile.dtype_counts = chunk.dtypes.value_counts().to_dict()
+        profile.null_counts = self.null_counts.add(
+            chunk.isna().sum(), fill_value=0
+        ).astype(np.int64)
+
+        cols = self.numeric_cols
+        profile.stats = copy.deepcopy(self.stats)
+        for rows in _row_blocks(chunk[cols]):
+            profile.stats.merge(RunningStats.from_array(cols, rows))
+
+        profile.sketches, profile.histograms = {}, {}
+        profile.quantiles = self.quantiles.copy()
+        for j, col in enumerate(cols):
+            valid = _sorted_values(chunk[col])
+            profile.sketches[col] = copy.deepcopy(self.sketches[col]).merge(
+                QuantileSketch.from_sorted(valid)
+            )
+            profile.histograms[col] = _merge_histogram(
+                self.histograms[col], valid, profile.stats.min[j], profile.stats.max[j]
+            )
+            profile.quantiles.loc[:, col] = profile.sketches[col].quantile(
+                PROFILE_QUANTILES, profile.stats.min[j], profile.stats.max[j]
+            )
+
+        profile.category_counts, profile.top_categories = {}, {}
+        profile.n_unique = {}
+        for col in self.categorical_cols:
+            counts = self.category_counts[col].add(
+                chunk[col].value_counts(), fill_value=0
+            )
+            profile._set_category_counts(
+                col, counts.astype(np.int64).sort_values(ascending=False)
+            )
+
+        if self._comoments is not None:
+            profile._comoments = copy.deepcopy(self._comoments)
+            for rows in _row_blocks(chunk[cols]):
+                profile._comoments.merge(
+                    CoMoments.from_array(
+                        cols, rows, COMOMENT_BLOCK, profile._comoments.shift
+                    )
+                )
+        return profile
+
+    # ------------------------------------------
+    # Leitura
+    # ------------------------------------------
+    def comoments(self, data: pd.DataFrame) -> CoMoments:
+        """
+        Co-momentos das colunas numéricas, por par de colunas preenchidas
+        (calculados na primeira chamada, em faixas de linhas).
+        """
+        with self._lock:
+            if self._comoments is None:
+                moments = None
+                for rows in _row_blocks(data[self.numeric_cols]):
+                    block = CoMoments.from_array(
+                        self.numeric_cols,
+                        rows,
+                        COMOMENT_BLOCK,
+                        None if moments is None else moments.shift,
+                    )
+                    moments = block if moments is None else moments.merge(block)
+                self._comoments = moments or CoMoments(self.numeric_cols)
+            return self._comoments
+
+    def quantile(self, q: float, cols=None) -> pd.Series:
+        cols = self.numeric_cols if cols is None else list(cols)
+        return self.quantiles.loc[q, cols].astype(float)
+
+    def describe(self, cols=None) -> pd.DataFrame:
+        """Equivalente a data[cols].describe().T, sem reler os dados."""
+        cols = self.numeric_cols if cols is None else list(cols)
+        frame = self.stats.to_frame().loc[cols]
+        frame.insert(4, "25%", self.quantile(0.25, cols))
+        frame.insert(5, "50%", self.quantile(0.5, cols))
+        frame.insert(6, "75%", self.quantile(0.75, cols))
+        return frame
+
+
+def _hist_range(mins, maxs):
+    """Limites dos bins (mesma convenção do numpy para colunas vazias/constantes)."""
+    lo = np.where(np.isnan(mins), 0.0, mins)
+    hi = np.where(np.isnan(maxs), 1.0, maxs)
+    same = lo == hi
+    return np.where(same, lo - 0.5, lo), np.where(same, hi + 0.5, hi)
+
+
+def _row_blocks(frame: pd.DataFrame):
+    """
+    Faixas de linhas como arrays float64 (NaN = ausente), com no máximo
+    COLUMN_BLOCK x ROW_BLOCK valores (menos linhas quando há muitas colunas).
+    """
+    step = max(1024, ROW_BLOCK * COLUMN_BLOCK // max(frame.shape[1], COLUMN_BLOCK))
+    for start in range(0, len(frame), step):
+        yield frame.iloc[start : start + step].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+
+
+def _sorted_values(series: pd.Series) -> np.ndarray:
+    """
+    Valores válidos da coluna em ordem crescente, no tipo da coluna
+    (float32/int8 continuam estreitos): uma única cópia, ordenada no lugar.
+    """
+    if isinstance(series.dtype, np.dtype):
+        values = series.to_numpy()
+        if values.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+        else:
+            values = values.copy()
+    else:
+        # Inteiros/decimais com pd.NA
+        values = series.dropna().to_numpy(dtype=np.float64)
+    values.sort()
+    return values
+
+
+def _histogram_counts(block, lo, hi) -> np.ndarray:
+    """
+    Contagens de HIST_BINS bins de todas as colunas do bloco com um único
+    np.bincount (mesmas bordas de np.histogram(col, bins=HIST_BINS)).
+    """
+    n_cols = block.shape[1]
+    with np.errstate(invalid="ignore"):
+        idx = np.floor((block - lo) / (hi - lo) * HIST_BINS)
+    valid = ~np.isnan(idx)
+    idx = np.clip(np.where(valid, idx, 0), 0, HIST_BINS - 1).astype(np.int64)
+    idx += np.arange(n_cols) * HIST_BINS
+    return np.bincount(idx[valid], minlength=n_cols * HIST_BINS).reshape(
+        n_cols, HIST_BINS
+    )
+
+
+def _merge_histogram(histogram, values, new_min, new_max):
+    """
+    Soma os valores novos a um histograma. Se a faixa cresceu, os bins antigos
+    são redistribuídos nas bordas novas (massa uniforme dentro de cada bin)
+    antes da soma.
+    """
+    counts, edges = histogram
+    lo, hi = _hist_range(np.array([new_min]), np.array([new_max]))
+    if (edges[0], edges[-1]) != (lo[0], hi[0]) and counts.sum():
+        new_edges = np.linspace(lo[0], hi[0], HIST_BINS + 1)
+        cumulative = np.interp(new_edges, edges, np.r_[0, np.cumsum(counts)])
+        counts = np.diff(cumulative)
+        edges = new_edges
+    added = np.histogram(values, edges)[0] if len(values) else 0
+    return np.rint(counts + added).astype(np.int64), edges
+
+
+# ==========================================
+# 🗂️ Registro de perfis por dataset
+# ==========================================
+@st.cache_resource(show_spinner=False)
+def _profile_registry():
+    """
+    Perfis compartilhados por todas as sessões do processo (LRU por hash) e
+    um lock por hash em construção, para que só quem pede o mesmo dataset
+    espere pelo cálculo.
+    """
+    return {"profiles": OrderedDict(), "building": {}, "lock": threading.Lock()}
+
+
+def _cached_profile(registry: dict, file_hash: str):
+    profiles = registry["profiles"]
+    if file_hash in profiles:
+        profiles.move_to_end(file_hash)
+        return profiles[file_hash]
+    return None
+
+
+def _register(file_hash: str, build) -> DatasetProfile:
+    registry = _profile_registry()
+    with registry["lock"]:
+        profile = _cached_profile(registry, file_hash)
+        if profile is not None:
+            return profile
+        building = registry["building"].setdefault(file_hash, threading.Lock())
+
+    # O cálculo roda fora do lock global: outros datasets não ficam bloqueados
+    with building:
+        with registry["lock"]:
+            profile = _cached_profile(registry, file_hash)
+        if profile is not None:
+            return profile
+        try:
+            profile = build()
+        finally:
+            with registry["lock"]:
+                registry["building"].pop(file_hash, None)
+                if profile is not None:
+                    profiles = registry["profiles"]
+                    profiles[file_hash] = profile
+                    while len(profiles) > MAX_PROFILES:
+                        profiles.popitem(last=False)
+        return profile
+
+
+def get_profile(data: pd.DataFrame) -> DatasetProfile:
+    """
+    Retorna o perfil do dataset carregado (chave: st.session_state["file_hash"]),
+    calculando-o na primeira chamada.
+    """
+    file_hash = st.session_state.get("file_hash")
+    if file_hash is None:
+        return DatasetProfile(data)
+    return _register(file_hash, lambda: DatasetProfile(data))
+
+
+def extend_profile(
+    base_hash: str, new_hash: str, base_data: pd.DataFrame, chunk: pd.DataFrame
+) -> DatasetProfile:
+    """Registra o perfil de (base + chunk) a partir do perfil da base."""
+    base = _register(base_hash, lambda: DatasetProfile(base_data))
+    return _register(new_hash, lambda: base.merged(chunk))
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.data_loader import append_parent, time_values
+
+# Níveis da pirâmide, do mais fino ao mais grosso: (rótulo, frequência pandas)
+ROLLUP_LEVELS = [
+    ("Minuto", "min"),
+    ("Hora", "h"),
+    ("Dia", "D"),
+    ("Semana", "W"),
+    ("Mês", "M"),
+]
+
+# Número de células (linhas x colunas) convertidas para float64 por bloco de linhas
+ROW_BLOCK_CELLS = 8_000_000
+
+
+def _bucket(index: pd.DatetimeIndex, freq: str) -> pd.DatetimeIndex:
+    """Início do bucket de cada instante (semanas e meses não são frequências fixas)."""
+    if freq in ("W", "M"):
+        return index.to_period(freq).to_timestamp()
+    return index.floor(freq)
+
+
+def _aggregate(level: pd.DataFrame, keys) -> pd.DataFrame:
+    """Combina buckets somando contagens/somas e tomando min/max dos extremos."""
+    return pd.concat(
+        {
+            "count": level["count"].groupby(keys, sort=True).sum(),
+            "sum": level["sum"].groupby(keys, sort=True).sum(),
+            "min": level["min"].groupby(keys, sort=True).min(),
+            "max": level["max"].groupby(keys, sort=True).max(),
+        },
+        axis=1,
+    )
+
+
+# Função cacheada (pirâmide compartilhada por todas as sessões do processo)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def build_rollups(
+    file_hash: str, _data: pd.DataFrame, time_col: str, numeric_cols: list
+):
+    """
+    Pirâmide de agregações de uma coluna temporal: para cada nível
+    (minuto/hora/dia/semana/mês) guarda count/sum/min/max de cada coluna
+    numérica. Só o nível de minuto lê as linhas brutas; os demais são
+    montados a partir do nível anterior, que já é pequeno.
+
+    Retorna {frequência: DataFrame} com colunas MultiIndex (estatística, coluna).
+    Num dataset com incremento anexado, combina a pirâmide anterior com a das
+    linhas novas (buckets da fronteira somados), sem reler as linhas antigas.
+    """
+    parent = append_parent(file_hash)
+    if parent is not None and parent[1] < len(_data):
+        previous_hash, previous_rows = parent
+        previous = build_rollups(
+            previous_hash, _data.iloc[:previous_rows], time_col, numeric_cols
+        )
+        new = _build_pyramid(_data.iloc[previous_rows:], time_col, numeric_cols)
+        pyramid = {}
+        for freq, level in previous.items():
+            level = pd.concat([level, new[freq]])
+            pyramid[freq] = _aggregate(level, level.index)
+        return pyramid
+    return _build_pyramid(_data, time_col, numeric_cols)
+
+
+def _minute_level(data: pd.DataFrame, time_col: str, numeric_cols: list):
+    """count/sum/min/max por minuto de um bloco de linhas brutas."""
+    # Instantes sem fuso (UTC): to_period descartaria o fuso das semanas/meses
+    times = pd.DatetimeIndex(time_values(data[time_col]))
+    valid = ~times.isna()
+    values = data.loc[valid, numeric_cols].astype(np.float64)
+    values.index = _bucket(times[valid], "min")
+    return _aggregate(
+        {"count": values.notna(), "sum": values, "min": values, "max": values},
+        values.index,
+    )
+
+
+def _build_pyramid(data: pd.DataFrame, time_col: str, numeric_cols: list) -> dict:
+    """
+    Pirâmide a partir das linhas brutas, nível a nível. O nível de minuto é
+    montado em blocos de linhas (só um bloco vira float64 por vez) e os
+    agregados parciais são combinados conforme se acumulam.
+    """
+    step = max(1, ROW_BLOCK_CELLS // max(len(numeric_cols), 1))
+    partials, pending, limit = [], 0, step
+    # Ao menos um bloco, para que um dataset vazio ainda tenha as colunas
+    for start in range(0, max(len(data), 1), step):
+        partial = _minute_level(data.iloc[start : start + step], time_col, numeric_cols)
+        partials.append(partial)
+        pending += len(partial)
+        if len(partials) > 1 and pending > limit:
+            merged = pd.concat(partials)
+            partials = [_aggregate(merged, merged.index)]
+            # Limite dobra com o acumulado: cada bucket é recombinado O(1) vezes
+            pending = len(partials[0])
+            limit = max(step, 2 * pending)
+
+    minute = pd.concat(partials)
+    if len(partials) > 1:
+        minute = _aggregate(minute, minute.index)
+
+    pyramid = {"min": minute}
+    previous = minute
+    for _, freq in ROLLUP_LEVELS[1:]:
+        previous = _aggregate(previous, _bucket(previous.index, freq))
+        pyramid[freq] = previous
+
+    return pyramid
+
+
+def rollup_series(pyramid: dict, freq: str, value_col: str, start=None, end=None):
+    """count/mean/min/max de uma coluna num nível da pirâmide, dentro de [start, end]."""
+    level = pyramid[freq].loc[start:end]
+    count = level[("count", value_col)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = level[("sum", value_col)] / count.where(count > 0)
+    return pd.DataFrame(
+        {
+            "count": count,
+            "mean": mean,
+            "min": level[("min", value_col)],
+            "max": level[("max", value_col)],
+        }
+    ).dropna(subset=["mean"])
+
+
+def choose_level(pyramid: dict, start, end, max_points: int) -> str:
+    """Nível mais fino cujo número de buckets no intervalo cabe em max_points."""
+    for _, freq in ROLLUP_LEVELS:
+        if len(pyramid[freq].loc[start:end]) <= max_points:
+            return freq
+    return ROLLUP_LEVELS[-1][1]
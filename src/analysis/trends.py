@@ -1,44 +1,196 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
-from utils.plot_utils import apply_blue_theme
+from utils.plot_utils import apply_blue_theme, cached_plot
+from utils.downsampling import lttb
+from src.data_loader import append_parent, detect_time_columns, time_values
+from src.analysis.rollups import (
+    ROLLUP_LEVELS,
+    build_rollups,
+    choose_level,
+    rollup_series,
+)
 import pandas as pd  # Adicione esta linha, se não estiver presente
 
+# Largura útil do gráfico em pixels (14 pol. x 100 dpi): um ponto por pixel
+TREND_WIDTH_PX = 1400
 
-# Função cacheada
-@st.cache_data
-def generate_trend_plot(data: pd.DataFrame, time_col: str, value_col: str):
-    """Ordena e gera o gráfico de tendência, cacheados com base nas colunas selecionadas."""
-    # A ordenação dos dados (potencialmente pesada) é feita aqui
-    data_sorted = data.sort_values(time_col)
+# Resolução que lê as linhas brutas (as demais vêm da pirâmide de rollups)
+RAW_RESOLUTION = "raw"
+
+
+# Função cacheada (permutação grande: fica como recurso, sem cópia por chamada)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def sorted_time_index(file_hash: str, _data: pd.DataFrame, time_col: str):
+    """
+    Permutação que ordena o dataset pela coluna temporal e os instantes já
+    ordenados (datetime64 sem fuso, em UTC), calculados uma única vez por
+    (dataset, coluna) e reutilizados por todas as variáveis numéricas.
+    Num dataset com incremento anexado, só as linhas novas são ordenadas e
+    intercaladas na ordem anterior (mesmo resultado da ordenação estável).
+    """
+    dtype = np.int32 if len(_data) < np.iinfo(np.int32).max else np.int64
+    parent = append_parent(file_hash)
+    if parent is not None and parent[1] < len(_data):
+        previous_hash, previous_rows = parent
+        previous_order, previous_times = sorted_time_index(
+            previous_hash, _data.iloc[:previous_rows], time_col
+        )
+        new_order, new_times = _sort_times(_data[time_col].iloc[previous_rows:])
+        # Empates: linhas antigas primeiro (side="right"); NaT continua no fim
+        positions = np.searchsorted(previous_times, new_times, side="right")
+        order = np.insert(
+            previous_order.astype(dtype), positions, new_order + previous_rows
+        )
+        times = np.insert(previous_times, positions, new_times)
+    else:
+        order, times = _sort_times(_data[time_col])
+        order = order.astype(dtype)
+    order.flags.writeable = False
+    times.flags.writeable = False
+    return order, times
+
+
+def _sort_times(column: pd.Series):
+    """Permutação estável (NaT no fim) e instantes ordenados de uma coluna."""
+    times = time_values(column).reset_index(drop=True)
+    order = times.sort_values(kind="stable", na_position="last").index.to_numpy()
+    return order, times.to_numpy(dtype="datetime64[ns]")[order]
+
+
+def downsample_trend(
+    file_hash, data, time_col, value_col, start=None, end=None, n_points=TREND_WIDTH_PX
+):
+    """
+    Série ordenada pelo tempo, recortada em [start, end] e reduzida por LTTB
+    a ~n_points pontos. Retorna índices posicionais das linhas escolhidas e
+    os instantes (sem fuso) correspondentes.
+    """
+    order, times = sorted_time_index(file_hash, data, time_col)
+
+    # Recorte do intervalo por busca binária na ordem já calculada
+    if start is not None or end is not None:
+        lo = (
+            0 if start is None else np.searchsorted(times, np.datetime64(start), "left")
+        )
+        hi = (
+            len(times)
+            if end is None
+            else np.searchsorted(times, np.datetime64(end), "right")
+        )
+        order, times = order[lo:hi], times[lo:hi]
+
+    values = data[value_col].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    keep = ~np.isnan(values) & ~np.isnat(times)
+    order, values, times = order[keep], values[keep], times[keep]
+
+    x = times.astype(np.int64).astype(np.float64)
+    chosen = lttb(x, values, n_points)
+    return order[chosen], times[chosen]
+
+
+# Gráficos renderizados em PNG e guardados no cache de imagens (LRU)
+def generate_trend_plot(
+    file_hash: str,
+    data: pd.DataFrame,
+    time_col: str,
+    value_col: str,
+    resolution: str = RAW_RESOLUTION,
+    start=None,
+    end=None,
+):
+    """
+    Gera o gráfico de tendência, cacheado por colunas, resolução e intervalo.
+    Resoluções agregadas leem só a pirâmide de rollups (média com faixa min–max);
+    a resolução bruta usa a ordenação cacheada + LTTB.
+    """
+    key = (file_hash, "trend", time_col, value_col, resolution, start, end)
+    if resolution == RAW_RESOLUTION:
+        draw = lambda: _draw_raw_trend(file_hash, data, time_col, value_col, start, end)
+    else:
+        pyramid = build_rollups(file_hash, data, time_col, _numeric_cols(data))
+        series = rollup_series(pyramid, resolution, value_col, start, end)
+        draw = lambda: _draw_rollup_trend(series, time_col, value_col, resolution)
+    return cached_plot(key, draw)
+
+
+def _numeric_cols(data: pd.DataFrame) -> list:
+    return data.select_dtypes(include=["number"]).columns.tolist()
+
+
+def _draw_raw_trend(file_hash, data, time_col, value_col, start, end):
+    # Ordenação reaproveitada do cache e série reduzida ao número de pixels
+    rows, times = downsample_trend(file_hash, data, time_col, value_col, start, end)
 
     fig, ax = plt.subplots(figsize=(14, 7))
-    ax.plot(data_sorted[time_col], data_sorted[value_col], color="#0099FF")
+    ax.plot(times, data[value_col].iloc[rows], color="#0099FF")
     ax.set_title(f"Tendência: {value_col} ao longo de {time_col}")
 
     return fig
 
 
+def _draw_rollup_trend(series: pd.DataFrame, time_col, value_col, resolution):
+    label = dict((freq, name) for name, freq in ROLLUP_LEVELS)[resolution]
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+    ax.fill_between(
+        series.index, series["min"], series["max"], color="#0099FF", alpha=0.2
+    )
+    ax.plot(series.index, series["mean"], color="#0099FF")
+    ax.set_title(f"Tendência: {value_col} ao longo de {time_col} (média por {label})")
+
+    return fig
+
+
 def render(data, numeric_cols):
     st.header("📈 Tendências")
     apply_blue_theme()
 
-    time_cols = [
-        c
-        for c in data.columns
-        if any(k in c.lower() for k in ["date", "time", "year", "month"])
-    ]
+    # Colunas temporais detectadas pelos valores na carga (datetime64) ou anos
+    time_cols = detect_time_columns(data)
     if not time_cols or not numeric_cols:
         st.info("Nenhuma coluna temporal/númerica detectada.")
         return
 
+    file_hash = st.session_state.get("file_hash")
     time_col = st.selectbox("Coluna temporal:", time_cols)
     value_col = st.selectbox("Variável numérica:", numeric_cols)
 
+    # Zoom: intervalo de datas (os limites vêm da pirâmide, sem varrer os dados)
+    pyramid = build_rollups(file_hash, data, time_col, _numeric_cols(data))
+    first, last = pyramid["min"].index.min(), pyramid["min"].index.max()
+    if pd.isna(first):
+        st.info("A coluna temporal não possui datas válidas.")
+        return
+
+    start, end = None, None
+    if first < last:
+        start, end = st.slider(
+            "Intervalo:",
+            min_value=first.to_pydatetime(),
+            max_value=(last + pd.Timedelta(minutes=1)).to_pydatetime(),
+            value=(
+                first.to_pydatetime(),
+                (last + pd.Timedelta(minutes=1)).to_pydatetime(),
+            ),
+            format="YYYY-MM-DD HH:mm",
+        )
+
+    labels = ["Automática"] + [name for name, _ in ROLLUP_LEVELS] + ["Bruta (LTTB)"]
+    choice = st.selectbox("Resolução:", labels)
+    if choice == "Automática":
+        resolution = choose_level(pyramid, start, end, TREND_WIDTH_PX)
+    elif choice == "Bruta (LTTB)":
+        resolution = RAW_RESOLUTION
+    else:
+        resolution = dict(ROLLUP_LEVELS)[choice]
+
     # CHAMADA À FUNÇÃO CACHEADA
-    fig = generate_trend_plot(data, time_col, value_col)
+    image = generate_trend_plot(
+        file_hash, data, time_col, value_col, resolution, start, end
+    )
 
-    st.pyplot(fig)
+    st.image(image, width="stretch")
     st.markdown(
         "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>", unsafe_allow_html=True
     )
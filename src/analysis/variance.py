@@ -2,29 +2,72 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from src.analysis.profile import get_profile
+from utils.plot_utils import cached_plot
 
+# Normaliza o IQR para um desvio-padrão robusto (IQR de uma normal = 1,349 σ)
+IQR_TO_SIGMA = 1.349
+# Variância quase nula: desvio-padrão abaixo desta fração da escala da coluna
+# (maior |valor|), ou seja, ruído numérico em torno de um valor fixo
+NEAR_ZERO_RELATIVE_STD = 1e-4
+# Barras exibidas no gráfico (as maiores pela métrica escolhida)
+MAX_BARS = 50
 
-# Função cacheada
-@st.cache_data
-def generate_variance_plot(data: pd.DataFrame, numeric_cols: list):
-    """Calcula a variância normalizada e gera o gráfico, cacheados."""
-    # Calcula variância padronizada (normalizada entre 0 e 1)
-    normalized_data = (data[numeric_cols] - data[numeric_cols].mean()) / data[
-        numeric_cols
-    ].std()
-    variances = normalized_data.var().sort_values(ascending=False)
+METRICS = {
+    "Coeficiente de variação": "CV",
+    "Variância": "Variância",
+    "Desvio robusto (IQR)": "Desvio robusto",
+}
+
+
+def dispersion_table(profile, numeric_cols: list) -> pd.DataFrame:
+    """
+    Métricas de dispersão por coluna, lidas dos momentos e quantis do perfil
+    (nenhuma cópia dos dados): variância, desvio, coeficiente de variação,
+    IQR, desvio robusto (IQR / 1,349) e a marcação de variância quase nula
+    (desvio zero ou desprezível diante da escala dos valores). O IQR não entra
+    na marcação: colunas esparsas ou binárias têm IQR zero e variam de fato.
+    """
+    stats = profile.stats.to_frame().loc[numeric_cols]
+    iqr = profile.quantile(0.75, numeric_cols) - profile.quantile(0.25, numeric_cols)
+    mean = stats["mean"].abs()
+    scale = pd.concat([mean, stats["min"].abs(), stats["max"].abs()], axis=1).max(1)
+
+    return pd.DataFrame(
+        {
+            "Variância": stats["std"] ** 2,
+            "Desvio padrão": stats["std"],
+            "CV": stats["std"] / mean.where(mean > 0),
+            "IQR": iqr,
+            "Desvio robusto": iqr / IQR_TO_SIGMA,
+            "Variância quase nula": stats["std"] <= NEAR_ZERO_RELATIVE_STD * scale,
+        }
+    )
+
+
+# Gráfico renderizado em PNG e guardado no cache de imagens (LRU)
+def generate_variance_plot(file_hash: str, table: pd.DataFrame, metric: str):
+    """Gera o gráfico da métrica de dispersão escolhida, cacheado por dataset."""
+    return cached_plot(
+        (file_hash, "variance", tuple(table.index), metric),
+        lambda: _draw_variance_plot(table[metric], metric),
+    )
+
+
+def _draw_variance_plot(values: pd.Series, metric: str):
+    values = values.dropna().sort_values(ascending=False).head(MAX_BARS)
 
     # Gráfico de barras horizontais
-    fig, ax = plt.subplots(figsize=(10, max(4, len(variances) * 0.4)))
+    fig, ax = plt.subplots(figsize=(10, max(4, len(values) * 0.4)))
 
-    y_pos = np.arange(len(variances))
-    ax.barh(y_pos, variances, color="#4DA6FF", edgecolor="#FFFFFF", linewidth=1.2)
+    y_pos = np.arange(len(values))
+    ax.barh(y_pos, values, color="#4DA6FF", edgecolor="#FFFFFF", linewidth=1.2)
     ax.set_yticks(y_pos)
-    ax.set_yticklabels(variances.index, color="#FFFFFF")
+    ax.set_yticklabels(values.index, color="#FFFFFF")
     ax.invert_yaxis()
 
-    ax.set_xlabel("Valor da Variância", color="#A7C7E7")
-    ax.set_title("Variância das Variáveis Numéricas", color="#FFFFFF", fontsize=14)
+    ax.set_xlabel(metric, color="#A7C7E7")
+    ax.set_title("Dispersão das Variáveis Numéricas", color="#FFFFFF", fontsize=14)
     ax.grid(axis="x", linestyle="--", alpha=0.3)
 
     fig.patch.set_facecolor("#001F3F")
@@ -35,7 +78,7 @@ def generate_variance_plot(data: pd.DataFrame, numeric_cols: list):
 
 def render(data, numeric_cols):
     """
-    Exibe o gráfico de variância para cada coluna numérica do dataset.
+    Exibe as métricas de dispersão de cada coluna numérica do dataset.
     """
 
     st.markdown("## 📉 Análise de Variância")
@@ -44,10 +87,23 @@ def render(data, numeric_cols):
         st.warning("⚠️ Nenhuma coluna numérica encontrada no dataset.")
         return
 
-    # CHAMA FUNÇÃO CACHEADA
-    fig = generate_variance_plot(data, numeric_cols)
+    # Métricas lidas do perfil (calculado uma vez por dataset)
+    table = dispersion_table(get_profile(data), numeric_cols)
+
+    metric = METRICS[st.selectbox("Métrica", list(METRICS))]
+    image = generate_variance_plot(st.session_state.get("file_hash"), table, metric)
+    if len(numeric_cols) > MAX_BARS:
+        st.caption(f"Mostrando as {MAX_BARS} colunas com maior {metric}.")
+    st.image(image, width="stretch")
+
+    near_zero = table.index[table["Variância quase nula"]].tolist()
+    if near_zero:
+        st.warning(
+            f"⚠️ {len(near_zero)} coluna(s) com variância quase nula: "
+            + ", ".join(map(str, near_zero[:20]))
+        )
+    st.dataframe(table)
 
-    st.pyplot(fig)
     st.markdown(
         "<hr style='border:1px solid #1E90FF; margin:2rem 0;'>", unsafe_allow_html=True
     )
@@ -0,0 +1,220 @@
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from utils.lazy_imports import optional_import
+
+# Orçamento de tokens para contexto do dataset + histórico (fora sistema e pergunta)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("EDA_CONTEXT_TOKENS", "1500"))
+# Fatia do orçamento reservada ao dataset (esquema + estatísticas)
+DATASET_BUDGET_SHARE = 0.6
+# Respostas antigas acima deste tamanho são resumidas no histórico
+LONG_ANSWER_TOKENS = 120
+HISTORY_MESSAGES = 6
+# Fatia do orçamento para interações antigas parecidas (memória) e tamanho
+# máximo de cada resposta lembrada
+MEMORY_BUDGET_SHARE = 0.15
+MEMORY_ANSWER_TOKENS = 80
+
+# Encodings do tiktoken por provedor e caracteres por token na estimativa
+TIKTOKEN_ENCODINGS = {"OpenAI": "o200k_base", "Groq": "cl100k_base"}
+CHARS_PER_TOKEN = {"OpenAI": 3.5, "Groq": 3.2, "Gemini": 4.0}
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    """Encoding do tiktoken (importado no primeiro uso), ou None se ausente."""
+    # Contagem exata de tokens opcional (sem ela, estimativa por caracteres)
+    tiktoken = optional_import("tiktoken", "contagem de tokens")
+    return tiktoken.get_encoding(name) if tiktoken is not None else None
+
+
+def count_tokens(text: str, provider: str) -> int:
+    """Tokens de `text` no tokenizador do provedor (ou estimativa por caracteres)."""
+    name = TIKTOKEN_ENCODINGS.get(provider)
+    encoding = _encoding(name) if name is not None else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN.get(provider, 3.5)) + 1
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", str(text).lower()))
+
+
+def _relevance(column, prompt_words: set) -> int:
+    """2 = nome citado na pergunta, 1 = alguma palavra do nome citada, 0 = nenhuma."""
+    name_words = _words(column)
+    if name_words and name_words <= prompt_words:
+        return 2
+    return 1 if name_words & prompt_words else 0
+
+
+def _name_list(label, names, budget, provider) -> str:
+    """`label: a, b, c` com tantos nomes quanto couberem em `budget` tokens."""
+    text = f"{label}: "
+    for n, name in enumerate(names):
+        candidate = text + ("" if n == 0 else ", ") + str(name)
+        if count_tokens(candidate, provider) > budget:
+            return f"{text} … (+{len(names) - n})."
+        text = candidate
+    return text + ("." if names else "nenhuma.")
+
+
+def _schema_lines(profile, budget, provider) -> list:
+    """Tamanho e nomes das colunas; cada lista de nomes usa até 1/3 do orçamento."""
+    return [
+        f"O dataset possui {profile.n_rows} linhas e {profile.n_cols} colunas.",
+        _name_list("Colunas numéricas", profile.numeric_cols, budget // 3, provider),
+        _name_list(
+            "Colunas categóricas", profile.categorical_cols, budget // 3, provider
+        ),
+    ]
+
+
+def _column_lines(profile, prompt: str) -> list:
+    """Uma linha de estatísticas por coluna, das mais para as menos relevantes."""
+    prompt_words = _words(prompt)
+    stats = profile.describe() if profile.numeric_cols else pd.DataFrame()
+    columns = profile.numeric_cols + profile.categorical_cols
+    # Mais relevantes primeiro; empate: colunas com mais nulos, depois a ordem original
+    order = sorted(
+        range(len(columns)),
+        key=lambda i: (
+            -_relevance(columns[i], prompt_words),
+            -int(profile.null_counts.get(columns[i], 0)),
+            i,
+        ),
+    )
+
+    lines = []
+    for i in order:
+        col = columns[i]
+        nulls = int(profile.null_counts.get(col, 0))
+        if col in stats.index:
+            row = stats.loc[col]
+            lines.append(
+                f"• {col}: média={row['mean']:.2f}, desvio={row['std']:.2f}, "
+                f"min={row['min']:.2f}, mediana={row['50%']:.2f}, "
+                f"max={row['max']:.2f}, nulos={nulls}"
+            )
+        else:
+            top = profile.top_categories.get(col, pd.Series(dtype=int)).head(3)
+            frequent = ", ".join(f"{k} ({v})" for k, v in top.items())
+            lines.append(
+                f"• {col}: {profile.n_unique.get(col, 0)} valores distintos, "
+                f"mais frequentes: {frequent}, nulos={nulls}"
+            )
+    return lines
+
+
+def _fit_lines(lines, budget, provider, omitted_label) -> tuple:
+    """Linhas inteiras (nunca cortadas no meio) que cabem no orçamento."""
+    kept, used = [], 0
+    for n, line in enumerate(lines):
+        cost = count_tokens(line, provider) + 1
+        if used + cost > budget:
+            kept.append(f"(+{len(lines) - n} {omitted_label} omitidas)")
+            break
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+def _compress(text: str, max_tokens: int, provider: str) -> str:
+    """Mantém as primeiras frases da resposta até `max_tokens`."""
+    if count_tokens(text, provider) <= max_tokens:
+        return text
+    kept = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        candidate = f"{kept} {sentence}".strip()
+        if count_tokens(candidate, provider) > max_tokens:
+            break
+        kept = candidate
+    if not kept:
+        kept = text[: int(max_tokens * CHARS_PER_TOKEN.get(provider, 3.5))]
+    return kept + " […]"
+
+
+def dataset_context(prompt, provider, budget, profile=None, summary=None) -> tuple:
+    """
+    Texto de contexto do dataset dentro de `budget` tokens: esquema primeiro,
+    depois estatísticas das colunas mais relevantes para a pergunta. Sem
+    perfil (modo streaming), usa as linhas do sumário pronto.
+    Retorna (texto, tokens usados).
+    """
+    if profile is None:
+        lines, used = _fit_lines(
+            (summary or "").splitlines(), budget, provider, "linhas"
+        )
+        return "\n".join(lines), used
+
+    schema, used = _fit_lines(
+        _schema_lines(profile, budget, provider), budget, provider, "linhas"
+    )
+    stats, stats_used = _fit_lines(
+        _column_lines(profile, prompt), budget - used, provider, "colunas"
+    )
+    return "\n".join(schema + ["Estatísticas por coluna:"] + stats), used + stats_used
+
+
+def history_context(history, provider, budget) -> list:
+    """
+    Turnos recentes (do mais novo para o mais antigo) até `budget` tokens;
+    respostas longas do assistente entram resumidas.
+    """
+    kept, used = [], 0
+    for msg in reversed(history[-HISTORY_MESSAGES:]):
+        content = msg["content"]
+        if msg["role"] == "assistant":
+            content = _compress(content, LONG_ANSWER_TOKENS, provider)
+        cost = count_tokens(content, provider) + 4  # papel + separadores
+        if used + cost > budget:
+            break
+        kept.append({"role": msg["role"], "content": content})
+        used += cost
+    return kept[::-1]
+
+
+def memory_context(memories, history, provider, budget) -> tuple:
+    """
+    Interações antigas parecidas com a pergunta (mais parecidas primeiro) que
+    cabem em `budget` tokens, sem as que já estão no histórico recente; as
+    respostas entram resumidas. Retorna (texto, tokens usados).
+    """
+    recent = {msg["content"].strip() for msg in history if msg["role"] == "user"}
+    lines = [
+        f"• P: {m['pergunta']} → R: "
+        f"{_compress(m['resposta'], MEMORY_ANSWER_TOKENS, provider)}"
+        for m in memories or []
+        if m["pergunta"].strip() not in recent
+    ]
+    if not lines:
+        return "", 0
+    kept, used = _fit_lines(lines, budget, provider, "interações")
+    if not kept or kept[0].startswith("(+"):
+        return "", 0
+    return "\n".join(["Interações anteriores relevantes:"] + kept), used
+
+
+def build_context(
+    prompt, history, provider, profile=None, summary=None, budget=None, memories=None
+) -> tuple:
+    """
+    Contexto do dataset e histórico dentro do orçamento de tokens: o dataset
+    fica com até DATASET_BUDGET_SHARE do orçamento, as interações antigas
+    relevantes (`memories`) com até MEMORY_BUDGET_SHARE, e o que sobrar vai
+    para os turnos recentes. Retorna (texto de contexto, mensagens do histórico).
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    context, used = dataset_context(
+        prompt, provider, int(budget * DATASET_BUDGET_SHARE), profile, summary
+    )
+    remembered, memory_used = memory_context(
+        memories, history, provider, int(budget * MEMORY_BUDGET_SHARE)
+    )
+    if remembered:
+        context = f"{context}\n{remembered}"
+    return context, history_context(history, provider, budget - used - memory_used)
@@ -1,45 +1,570 @@
 import pandas as pd
+import numpy as np
 import streamlit as st
 import hashlib
-from io import StringIO
+import logging
+import os
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from pandas.api.types import union_categoricals
+from src.running_stats import RunningStats
+from src.analysis.profile import extend_profile
+from utils import dataset_store
+
+# Hash rápido opcional (não criptográfico) para a chave do upload
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto com proporção de valores únicos abaixo deste limite viram "category"
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Detecção de colunas temporais: linhas testadas e fração mínima de datas válidas
+TIME_SAMPLE_ROWS = 1000
+TIME_MIN_PARSED = 0.95
+# Colunas inteiras de ano ("ano", "ano_venda", "year"...) também servem de eixo
+YEAR_NAME_PATTERN = re.compile(r"(^|[^a-z])(ano|year)([^a-z]|$)")
+YEAR_RANGE = (1000, 2999)
+
+# Versão do formato salvo no armazenamento local (muda quando a ingestão muda)
+LOADER_VERSION = 3
+
+# Modo streaming: linhas por bloco e tamanho da amostra mantida para as abas
+STREAM_CHUNK_ROWS = int(os.getenv("EDA_STREAM_CHUNK_ROWS", "200000"))
+STREAM_SAMPLE_ROWS = int(os.getenv("EDA_STREAM_SAMPLE_ROWS", "100000"))
+
+# Datasets carregados compartilhados pelas sessões do processo (somente leitura)
+LOADED_MAX_DATASETS = int(os.getenv("EDA_LOADED_MAX_DATASETS", "4"))
+# Datasets base com incrementos anexados mantidos no processo (um combinado por base)
+APPEND_MAX_DATASETS = 2
+
+# Tamanho dos blocos lidos ao calcular o hash do upload
+HASH_BLOCK_BYTES = 8 * 1024**2
+# Hashes de upload lembrados por sessão
+MAX_UPLOAD_HASHES = 16
 
 
 def _hash_file(file) -> str:
     """
-    Gera um hash SHA256 do conteúdo do arquivo CSV.
+    Gera um hash do conteúdo do arquivo CSV, lendo o buffer em blocos.
     Isso permite cache baseado no conteúdo, não apenas no nome.
+
+    O buffer é percorrido por um memoryview (sem cópias nem decode) com
+    xxh3-128 quando o xxhash está instalado, ou BLAKE2b caso contrário.
+    O prefixo do algoritmo evita colisão de chaves entre ambientes.
     """
-    content = file.getvalue()
-    if isinstance(content, bytes):
-        content = content.decode("utf-8", errors="ignore")
-    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+    if xxhash is not None:
+        hasher, prefix = xxhash.xxh3_128(), "xxh3"
+    else:
+        hasher, prefix = hashlib.blake2b(digest_size=32), "b2b"
 
+    if hasattr(file, "getbuffer"):
+        with file.getbuffer() as view:
+            for offset in range(0, len(view), HASH_BLOCK_BYTES):
+                hasher.update(view[offset : offset + HASH_BLOCK_BYTES])
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b""):
+            hasher.update(block)
+        file.seek(0)
 
-@st.cache_data(show_spinner=False)
-def load_data(file=None):
+    return f"{prefix}-{hasher.hexdigest()}"
+
+
+def _upload_key(file) -> str:
     """
-    Carrega um arquivo CSV e identifica colunas numéricas e categóricas.
-    O resultado é armazenado em cache para evitar recarregamentos.
+    Hash do upload calculado uma única vez por arquivo enviado: os reruns do
+    Streamlit reaproveitam o valor guardado na sessão pelo file_id do upload.
     """
+    file_id = getattr(file, "file_id", None)
+    if file_id is None:
+        return _hash_file(file)
 
-    try:
-        # Gera hash do conteúdo do arquivo
-        file_hash = _hash_file(file)
+    known = st.session_state.setdefault("upload_hashes", {})
+    if file_id not in known:
+        # Só os uploads recentes interessam (principal + arquivos anexados)
+        while len(known) >= MAX_UPLOAD_HASHES:
+            known.pop(next(iter(known)))
+        known[file_id] = _hash_file(file)
+    return known[file_id]
 
-        # Lê o arquivo CSV usando pandas
+
+# ==========================================
+# ⚡ Motor de ingestão colunar
+# ==========================================
+def _read_csv_fast(file):
+    """
+    Lê o CSV com o leitor colunar multithread do pyarrow.
+    Se o pyarrow não estiver instalado (ou não suportar o arquivo),
+    volta para o leitor padrão do pandas.
+    """
+    try:
+        return pd.read_csv(file, engine="pyarrow"), "pyarrow"
+    except (ImportError, ValueError):
         file.seek(0)
-        data = pd.read_csv(file)
+        return pd.read_csv(file), "c"
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(
+        series
+    )
+
+
+def _parse_datetime(series: pd.Series):
+    """
+    Detecta colunas temporais pelos valores (não pelo nome): uma amostra é
+    testada primeiro e, se quase tudo for data, a coluna inteira é convertida.
+    Retorna a série datetime64 ou None.
+    """
+    sample = series.dropna().head(TIME_SAMPLE_ROWS).astype(str)
+    # Só textos com separadores de data/hora (evita tratar "2024" ou "17" como datas)
+    if sample.empty or not sample.str.contains(r"[-/:T ]").all():
+        return None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        if pd.to_datetime(sample, errors="coerce").notna().mean() < TIME_MIN_PARSED:
+            return None
+        parsed = pd.to_datetime(series, errors="coerce")
+
+    if parsed.notna().sum() < TIME_MIN_PARSED * series.notna().sum():
+        return None
+    return parsed
+
+
+def _optimize_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduz a memória do DataFrame sem perder informação:
+    - inteiros vão para a menor largura que comporta min/max;
+    - floats só viram float32 se todos os valores sobrevivem à conversão;
+    - colunas de texto cujos valores são datas viram datetime64;
+    - colunas de texto com poucos valores distintos viram "category".
+    """
+    optimized = {}
+    n_rows = len(data)
 
-        # Identifica colunas
-        numeric_cols = data.select_dtypes(include=["number"]).columns.tolist()
-        categorical_cols = data.select_dtypes(exclude=["number"]).columns.tolist()
+    for col in data.columns:
+        series = data[col]
+
+        if pd.api.types.is_bool_dtype(series):
+            optimized[col] = series
+        elif pd.api.types.is_integer_dtype(series):
+            optimized[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            values = series.to_numpy()
+            as_f32 = values.astype(np.float32)
+            if np.array_equal(as_f32.astype(values.dtype), values, equal_nan=True):
+                optimized[col] = pd.Series(as_f32, index=series.index, name=col)
+            else:
+                optimized[col] = series
+        elif _is_text(series) and n_rows:
+            parsed = _parse_datetime(series)
+            if parsed is not None:
+                optimized[col] = parsed
+            elif series.nunique(dropna=True) / n_rows <= CATEGORY_MAX_UNIQUE_RATIO:
+                optimized[col] = series.astype("category")
+            else:
+                optimized[col] = series
+        else:
+            optimized[col] = series
+
+    return pd.DataFrame(optimized, index=data.index)
+
+
+def _memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Memória por coluna (MB) antes e depois da otimização de tipos."""
+    mb = 1024**2
+    report = pd.DataFrame(
+        {
+            "Tipo original": before.dtypes.astype(str),
+            "Tipo otimizado": after.dtypes.astype(str),
+            "Memória antes (MB)": before.memory_usage(deep=True, index=False) / mb,
+            "Memória depois (MB)": after.memory_usage(deep=True, index=False) / mb,
+        }
+    )
+    report["Redução (%)"] = (
+        100
+        * (1 - report["Memória depois (MB)"] / report["Memória antes (MB)"])
+    ).fillna(0.0)
+    return report
+
+
+@st.cache_resource(show_spinner=False, max_entries=LOADED_MAX_DATASETS)
+def _load_optimized(file_hash, _file):
+    """
+    Lê, otimiza e classifica as colunas do CSV (parte cacheada do carregamento).
+    A chave do cache é só o hash do conteúdo: o upload (_file) não é re-hasheado.
+
+    O DataFrame é o mesmo objeto para todas as sessões e reruns (sem a cópia
+    por pickle do st.cache_data, que desfazia o mmap do armazenamento local):
+    quem o recebe deve tratá-lo como somente leitura.
+    """
+    # Mesmo conteúdo já carregado antes (inclusive em outra sessão/processo)
+    start = time.perf_counter()
+    stored = dataset_store.load_dataset(file_hash)
+    if stored is not None and stored[1].get("loader_version") == LOADER_VERSION:
+        data, meta = stored
+        report = {
+            "engine": "armazenamento local (mmap)",
+            "parse_seconds": time.perf_counter() - start,
+            "optimize_seconds": 0.0,
+            "columns": _memory_report(data, data),
+        }
+        return data, meta["numeric_cols"], meta["categorical_cols"], report
+
+    _file.seek(0)
+    start = time.perf_counter()
+    raw, engine = _read_csv_fast(_file)
+    parse_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = _optimize_dtypes(raw)
+    optimize_seconds = time.perf_counter() - start
+
+    report = {
+        "engine": engine,
+        "parse_seconds": parse_seconds,
+        "optimize_seconds": optimize_seconds,
+        "columns": _memory_report(raw, data),
+    }
+    del raw
+
+    # Identifica colunas
+    numeric_cols = data.select_dtypes(include=["number"]).columns.tolist()
+    categorical_cols = data.select_dtypes(exclude=["number"]).columns.tolist()
+
+    # O armazenamento é só um cache: falhar ao gravar não derruba o upload
+    try:
+        dataset_store.save_dataset(
+            file_hash,
+            data,
+            {
+                "numeric_cols": numeric_cols,
+                "categorical_cols": categorical_cols,
+                "loader_version": LOADER_VERSION,
+            },
+        )
+    except Exception:
+        logger.warning(
+            "Falha ao salvar o dataset %s no armazenamento local",
+            file_hash,
+            exc_info=True,
+        )
+
+    return data, numeric_cols, categorical_cols, report
+
+
+def load_data(file=None):
+    """
+    Carrega um arquivo CSV e identifica colunas numéricas e categóricas.
+    O resultado é armazenado em cache para evitar recarregamentos; o relatório
+    de ingestão (tempo de parse e memória por coluna) fica em
+    st.session_state["load_report"].
+    """
+
+    try:
+        file_hash = _upload_key(file)
+        data, numeric_cols, categorical_cols, report = _load_optimized(
+            file_hash, file
+        )
 
         st.session_state["file_hash"] = (
             file_hash  # Armazena hash para comparação futura
         )
+        st.session_state["load_report"] = report
+        st.session_state.pop("stream_info", None)
 
         return data, numeric_cols, categorical_cols
 
     except Exception as e:
         st.error(f"Erro ao carregar o arquivo: {e}")
         return None, [], []
+
+
+# ==========================================
+# ➕ Anexar incrementos ao dataset carregado
+# ==========================================
+def _append_column(current: pd.Series, new: pd.Series, name) -> pd.Series:
+    """Concatena uma coluna mantendo o tipo do dataset atual."""
+    if isinstance(current.dtype, pd.CategoricalDtype):
+        merged = union_categoricals(
+            [current.array, new.astype("category").array], ignore_order=True
+        )
+        return pd.Series(merged, name=name)
+    if pd.api.types.is_numeric_dtype(current):
+        if not pd.api.types.is_numeric_dtype(new):
+            raise ValueError(f"a coluna '{name}' não é numérica no arquivo anexado")
+    elif pd.api.types.is_datetime64_any_dtype(current):
+        new = pd.to_datetime(new, errors="coerce")
+    return pd.concat([current, new], ignore_index=True).rename(name)
+
+
+# Registro do processo: um dataset combinado por base, estendido a cada incremento
+@st.cache_resource(show_spinner=False)
+def _append_registry():
+    """
+    Datasets com incrementos anexados, por hash da base (LRU):
+    {"data", "hash", "chunks"}, e a origem de cada hash anexado,
+    {hash: (hash anterior, linhas anteriores)}, para as abas estenderem
+    rollups e ordenações em vez de recalculá-las.
+    """
+    return {"datasets": OrderedDict(), "parents": {}, "lock": threading.Lock()}
+
+
+def append_parent(file_hash: str):
+    """(hash anterior, linhas anteriores) se `file_hash` veio de um incremento."""
+    registry = _append_registry()
+    with registry["lock"]:
+        return registry["parents"].get(file_hash)
+
+
+def _append_chunk(entry: dict, chunk_hash: str, _file) -> int:
+    """
+    Anexa o CSV `_file` ao dataset combinado de `entry` (mesmas colunas) e
+    registra o perfil do resultado a partir do perfil anterior, lendo só as
+    linhas novas. Retorna o número de linhas anexadas.
+    """
+    data, base_hash = entry["data"], entry["hash"]
+    chunk = _load_optimized(chunk_hash, _file)[0]
+    if set(chunk.columns) != set(data.columns):
+        raise ValueError(
+            "o arquivo anexado precisa ter as mesmas colunas do dataset atual"
+        )
+
+    combined = pd.DataFrame(
+        {col: _append_column(data[col], chunk[col], col) for col in data.columns}
+    )
+    new_hash = (
+        "app-"
+        + hashlib.blake2b(
+            f"{base_hash}+{chunk_hash}".encode(), digest_size=16
+        ).hexdigest()
+    )
+    extend_profile(base_hash, new_hash, data, combined.iloc[len(data) :])
+
+    entry["data"], entry["hash"] = combined, new_hash
+    entry["chunks"].append(chunk_hash)
+    entry["parents"][new_hash] = (base_hash, len(data))
+    return len(chunk)
+
+
+def append_data(data, files):
+    """
+    Anexa incrementos (CSVs com as mesmas colunas) ao dataset carregado.
+    O hash da sessão passa a identificar o resultado combinado; o perfil
+    (estatísticas, histogramas, quantis, co-momentos) é atualizado só com as
+    linhas novas, então as abas só regeneram os gráficos.
+
+    O dataset combinado fica no processo (um por base): reruns com os mesmos
+    arquivos o reutilizam, e um arquivo novo só concatena as suas linhas.
+    """
+    registry = _append_registry()
+    base_hash = st.session_state["file_hash"]
+    try:
+        chunk_hashes = [_upload_key(file) for file in files]
+        with registry["lock"]:
+            # `data` é sempre a base carregada: volta ao hash dela se preciso
+            while base_hash in registry["parents"]:
+                base_hash = registry["parents"][base_hash][0]
+            datasets = registry["datasets"]
+            entry = datasets.get(base_hash)
+            done = 0 if entry is None else len(entry["chunks"])
+            # Recomeça da base se algum arquivo anterior foi removido/trocado
+            if entry is None or entry["chunks"] != chunk_hashes[:done]:
+                done = 0
+                entry = {
+                    "data": data,
+                    "hash": base_hash,
+                    "chunks": [],
+                    "rows": 0,
+                    "parents": {},
+                }
+            try:
+                for chunk_hash, file in zip(chunk_hashes[done:], files[done:]):
+                    entry["rows"] += _append_chunk(entry, chunk_hash, file)
+            finally:
+                # Guarda o que já foi anexado, mesmo se um arquivo falhar
+                datasets[base_hash] = entry
+                datasets.move_to_end(base_hash)
+                registry["parents"].update(entry["parents"])
+                while len(datasets) > APPEND_MAX_DATASETS:
+                    evicted = datasets.popitem(last=False)[1]
+                    for key in evicted["parents"]:
+                        registry["parents"].pop(key, None)
+
+        data = entry["data"]
+        st.session_state["file_hash"] = entry["hash"]
+        st.session_state["appended_rows"] = entry["rows"]
+
+    except Exception as e:
+        st.error(f"Erro ao anexar o arquivo: {e}")
+
+    numeric_cols = data.select_dtypes(include=["number"]).columns.tolist()
+    categorical_cols = data.select_dtypes(exclude=["number"]).columns.tolist()
+    return data, numeric_cols, categorical_cols
+
+
+# ==========================================
+# 🌊 Ingestão em streaming (arquivos maiores que a memória)
+# ==========================================
+def _reservoir_update(sample, chunk, seen, capacity, rng):
+    """
+    Amostragem de reservatório vetorizada: mantém no máximo `capacity` linhas,
+    cada linha já lida com a mesma probabilidade de estar na amostra.
+    O índice da amostra é o "slot" do reservatório.
+    """
+    n = len(chunk)
+    positions = np.arange(seen, seen + n)
+
+    # Enquanto o reservatório não enche, as linhas entram direto
+    fill = positions < capacity
+    slots = positions[fill]
+
+    # Depois, a linha i substitui um slot aleatório com probabilidade capacity/(i+1)
+    rest = positions[~fill]
+    draws = (rng.random(len(rest)) * (rest + 1)).astype(np.int64)
+    accepted = draws < capacity
+
+    rows = np.concatenate([np.flatnonzero(fill), np.flatnonzero(~fill)[accepted]])
+    slots = np.concatenate([slots, draws[accepted]])
+    if not len(rows):
+        return sample
+
+    # Se um slot é sorteado mais de uma vez no bloco, vale a última linha
+    _, last = np.unique(slots[::-1], return_index=True)
+    keep = len(slots) - 1 - last
+    rows, slots = rows[keep], slots[keep]
+
+    incoming = chunk.iloc[rows].set_axis(slots)
+    if sample is None:
+        return incoming
+    return pd.concat([sample[~sample.index.isin(slots)], incoming])
+
+
+def _common_dtype(current, new):
+    """Tipo resultante de uma coluna vista em vários blocos."""
+    if current is None:
+        return new
+    if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(new):
+        return np.result_type(current, new)
+    return current if current == new else np.dtype("object")
+
+
+@st.cache_data(show_spinner=False)
+def _load_streaming(
+    file_hash, _file, chunk_rows=STREAM_CHUNK_ROWS, sample_rows=STREAM_SAMPLE_ROWS
+):
+    """
+    Lê o CSV em blocos e acumula estatísticas sem materializar o arquivo:
+    contagem, nulos, média/variância (Welford), mínimo e máximo.
+    A memória de pico fica limitada ao tamanho do bloco mais a amostra.
+    """
+    _file.seek(0)
+
+    rng = np.random.default_rng(42)
+    dtypes, null_counts = {}, None
+    stats, sample = None, None
+    rows = 0
+
+    start = time.perf_counter()
+    for chunk in pd.read_csv(_file, chunksize=chunk_rows):
+        if stats is None:
+            numeric = chunk.select_dtypes(include=["number"]).columns.tolist()
+            stats = RunningStats(numeric)
+            null_counts = pd.Series(0, index=chunk.columns, dtype=np.int64)
+
+        for col in chunk.columns:
+            dtypes[col] = _common_dtype(dtypes.get(col), chunk[col].dtype)
+            if col in stats.columns and not pd.api.types.is_numeric_dtype(
+                chunk[col]
+            ):
+                stats.drop(col)
+
+        stats.update(chunk)
+        null_counts += chunk.isna().sum()
+        sample = _reservoir_update(sample, chunk, rows, sample_rows, rng)
+        rows += len(chunk)
+    parse_seconds = time.perf_counter() - start
+
+    if stats is None:
+        raise ValueError("O arquivo CSV está vazio.")
+
+    sample = _optimize_dtypes(sample.sort_index().reset_index(drop=True))
+    numeric_cols = list(stats.columns)
+    categorical_cols = [c for c in dtypes if c not in numeric_cols]
+
+    stream_info = {
+        "rows": rows,
+        "dtypes": {col: str(dtype) for col, dtype in dtypes.items()},
+        "null_counts": null_counts,
+        "stats": stats,
+        "sample_rows": len(sample),
+        "parse_seconds": parse_seconds,
+    }
+    return sample, numeric_cols, categorical_cols, stream_info
+
+
+def load_data_streaming(file=None):
+    """
+    Versão em streaming de load_data para arquivos maiores que a memória.
+    Retorna uma amostra aleatória limitada (para as abas de gráficos) e guarda
+    as estatísticas do arquivo inteiro em st.session_state["stream_info"].
+    """
+
+    try:
+        file_hash = _upload_key(file)
+        sample, numeric_cols, categorical_cols, stream_info = _load_streaming(
+            file_hash, file
+        )
+
+        st.session_state["file_hash"] = file_hash
+        st.session_state["stream_info"] = stream_info
+        st.session_state.pop("load_report", None)
+
+        return sample, numeric_cols, categorical_cols
+
+    except Exception as e:
+        st.error(f"Erro ao carregar o arquivo: {e}")
+        return None, [], []
+
+
+def _is_year_column(name, series: pd.Series) -> bool:
+    """Coluna inteira com nome de ano e valores entre YEAR_RANGE."""
+    if not pd.api.types.is_integer_dtype(series):
+        return False
+    if not YEAR_NAME_PATTERN.search(str(name).lower()):
+        return False
+    low, high = series.min(), series.max()
+    return pd.notna(low) and YEAR_RANGE[0] <= low and high <= YEAR_RANGE[1]
+
+
+def detect_time_columns(data: pd.DataFrame) -> list:
+    """
+    Colunas temporais: as datetime64 detectadas e convertidas na carga e as
+    colunas inteiras de ano (ex.: "ano", "year"), que não têm separador de data.
+    """
+    return [
+        col
+        for col in data.columns
+        if pd.api.types.is_datetime64_any_dtype(data[col])
+        or _is_year_column(col, data[col])
+    ]
+
+
+def time_values(series: pd.Series) -> pd.Series:
+    """
+    Instantes da coluna temporal como datetime64 sem fuso: colunas com fuso
+    vão para UTC, e anos inteiros viram 1º de janeiro do ano.
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert("UTC").dt.tz_localize(None)
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_datetime(series.astype("string"), format="%Y", errors="coerce")
+    return series
@@ -0,0 +1,300 @@
+import concurrent.futures
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Janela das estatísticas por provedor/modelo e mínimo de amostras para usar o p95
+STATS_WINDOW = 200
+MIN_SAMPLES = 5
+
+# Tentativas por provedor e backoff exponencial com jitter (segundos)
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 8.0
+
+# Espera pelo primeiro token antes do pedido duplicado, sem histórico de p95
+HEDGE_DEFAULT_S = float(os.getenv("EDA_HEDGE_DEFAULT_S", "4"))
+# Threads dedicadas aos dois streams de cada pedido duplicado
+HEDGE_MAX_WORKERS = int(os.getenv("EDA_HEDGE_WORKERS", "8"))
+
+# Provedor local para testes offline (só com EDA_ENABLE_MOCK=1): latência por
+# pedaço e taxa de falhas
+MOCK_ENABLED = os.getenv("EDA_ENABLE_MOCK", "").lower() in ("1", "true", "yes")
+MOCK_CHUNK_DELAY_S = float(os.getenv("EDA_MOCK_CHUNK_DELAY_S", "0.02"))
+MOCK_FAIL_RATE = float(os.getenv("EDA_MOCK_FAIL_RATE", "0"))
+
+RETRYABLE_MARKERS = (
+    "429",
+    "500",
+    "502",
+    "503",
+    "504",
+    "rate limit",
+    "overloaded",
+    "timeout",
+    "timed out",
+    "connection",
+    "unavailable",
+)
+
+
+# ==========================================
+# 📶 Estatísticas por provedor/modelo (processo)
+# ==========================================
+class ProviderStats:
+    """Latências (primeiro token e total) e falhas das últimas STATS_WINDOW chamadas."""
+
+    def __init__(self):
+        self.ttft = deque(maxlen=STATS_WINDOW)
+        self.total = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)
+        self._lock = threading.Lock()
+
+    def record_success(self, ttft: float, total: float) -> None:
+        with self._lock:
+            self.ttft.append(ttft)
+            self.total.append(total)
+            self.outcomes.append(True)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.outcomes.append(False)
+
+    def ttft_p95(self):
+        """p95 do tempo até o primeiro token, ou None com poucas amostras."""
+        with self._lock:
+            if len(self.ttft) < MIN_SAMPLES:
+                return None
+            return float(np.percentile(self.ttft, 95))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ttft, total = list(self.ttft), list(self.total)
+            outcomes = list(self.outcomes)
+
+        def pct(values, q):
+            return float(np.percentile(values, q)) if values else np.nan
+
+        return {
+            "Chamadas": len(outcomes),
+            "Erro (%)": 100 * outcomes.count(False) / len(outcomes) if outcomes else 0,
+            "1º token p50 (s)": pct(ttft, 50),
+            "1º token p95 (s)": pct(ttft, 95),
+            "Total p50 (s)": pct(total, 50),
+            "Total p95 (s)": pct(total, 95),
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def _stats_registry():
+    return {"stats": {}, "lock": threading.Lock()}
+
+
+def provider_stats(provider: str, model: str) -> ProviderStats:
+    registry = _stats_registry()
+    with registry["lock"]:
+        return registry["stats"].setdefault((provider, model), ProviderStats())
+
+
+def stats_table() -> pd.DataFrame:
+    """Tabela com as estatísticas de todos os provedores/modelos já usados."""
+    registry = _stats_registry()
+    with registry["lock"]:
+        items = list(registry["stats"].items())
+    rows = {
+        f"{provider} · {model}": stats.snapshot() for (provider, model), stats in items
+    }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+# ==========================================
+# 🧪 Provedor local (offline)
+# ==========================================
+def mock_stream(messages):
+    """Resposta simulada, em pedaços, com latência e falhas configuráveis."""
+    if random.random() < MOCK_FAIL_RATE:
+        raise ConnectionError("503 mock provider unavailable")
+    answer = (
+        "Resposta simulada (provedor local) para: "
+        f"{messages[-1]['content']}. Nenhuma API externa foi chamada."
+    )
+    for word in answer.split(" "):
+        time.sleep(MOCK_CHUNK_DELAY_S)
+        yield word + " "
+
+
+# ==========================================
+# 🔀 Roteamento: retentativas, failover e pedido duplicado
+# ==========================================
+def is_retryable(error: Exception) -> bool:
+    """Cota, sobrecarga, timeout e falhas de conexão valem nova tentativa."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter (entre 50% e 150% do valor base)."""
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2**attempt)
+    return delay * random.uniform(0.5, 1.5)
+
+
+class Candidate:
+    """Um provedor configurado: nome, modelo e função que abre o stream."""
+
+    def __init__(self, provider: str, model: str, open_stream):
+        self.provider = provider
+        self.model = model
+        self.open_stream = open_stream
+        # Resolvido aqui (thread do script): as threads do hedge só usam o objeto
+        self.stats = provider_stats(provider, model)
+
+
+def _attempts(candidate: Candidate, state: dict):
+    """
+    Stream de um provedor com retentativas. Só repete antes do primeiro
+    pedaço: depois disso o texto já foi exibido e o erro é repassado.
+    `state["started"]` indica se algum pedaço já saiu.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        start = time.perf_counter()
+        first_token = None
+        try:
+            for chunk in candidate.open_stream():
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    state["started"] = True
+                    state["provider"] = candidate.provider
+                yield chunk
+            total = time.perf_counter() - start
+            candidate.stats.record_success(
+                total if first_token is None else first_token, total
+            )
+            return
+        except Exception as e:
+            candidate.stats.record_error()
+            if first_token is not None or not is_retryable(e):
+                raise
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+
+@st.cache_resource(show_spinner=False)
+def _hedge_executor():
+    """
+    Executor só dos streams do hedge: cada um ocupa uma thread até terminar
+    ou ser cancelado, então não disputam o executor compartilhado do chat.
+    """
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+    )
+
+
+def _pump(tag, candidate, events, cancel):
+    """Roda um candidato numa thread, publicando (tag, tipo, valor) na fila."""
+    state = {"started": False}
+    stream = _attempts(candidate, state)
+    try:
+        for chunk in stream:
+            if cancel.is_set():
+                return
+            events.put((tag, "chunk", chunk))
+        events.put((tag, "done", None))
+    except Exception as e:
+        events.put((tag, "error", e))
+    finally:
+        stream.close()
+
+
+def _hedged(primary, secondary, executor, state):
+    """
+    Dispara o primário; se o primeiro token não chegar até o p95 dele, dispara
+    o mesmo pedido no secundário. Vence quem produzir o primeiro pedaço; o
+    outro é cancelado.
+    """
+    events, cancel = queue.Queue(), {0: threading.Event(), 1: threading.Event()}
+    candidates = {0: primary, 1: secondary}
+    executor.submit(_pump, 0, primary, events, cancel[0])
+    running, winner, errors = {0}, None, {}
+
+    wait = primary.stats.ttft_p95() or HEDGE_DEFAULT_S
+    try:
+        while running:
+            try:
+                tag, kind, value = events.get(timeout=wait if winner is None else None)
+            except queue.Empty:
+                if 1 not in running and 1 not in errors:
+                    executor.submit(_pump, 1, secondary, events, cancel[1])
+                    running.add(1)
+                wait = None
+                continue
+
+            if winner is not None and tag != winner:
+                continue
+            if kind == "error":
+                running.discard(tag)
+                errors[tag] = value
+                if winner is not None:
+                    raise value
+                if not running and 1 not in errors:
+                    # Primário falhou antes do tempo do hedge: tenta o secundário
+                    executor.submit(_pump, 1, secondary, events, cancel[1])
+                    running.add(1)
+                continue
+            if winner is None:
+                winner = tag
+                state["started"] = True
+                state["provider"] = candidates[tag].provider
+                for other in running - {tag}:
+                    cancel[other].set()
+                running = {tag}
+            if kind == "done":
+                return
+            yield value
+    finally:
+        for event in cancel.values():
+            event.set()
+
+    raise errors.get(0) or errors.get(1)
+
+
+def route_stream(candidates, executor=None, hedge=False, state=None):
+    """
+    Gera a resposta pelo primeiro candidato que funcionar: cada provedor tem
+    retentativas com backoff e, se falhar antes do primeiro token, o próximo
+    assume. Com `hedge`, os dois primeiros correm em paralelo a partir do p95,
+    no `executor` dado ou no executor dedicado do hedge.
+    `state` recebe "provider" (quem respondeu) e "started".
+    """
+    state = {} if state is None else state
+    state.setdefault("started", False)
+    last_error = None
+
+    if hedge and len(candidates) > 1:
+        executor = executor or _hedge_executor()
+        try:
+            yield from _hedged(candidates[0], candidates[1], executor, state)
+            return
+        except Exception as e:
+            if state["started"]:
+                raise
+            last_error, candidates = e, candidates[2:]
+
+    for candidate in candidates:
+        try:
+            yield from _attempts(candidate, state)
+            return
+        except Exception as e:
+            if state["started"]:
+                raise
+            last_error = e
+
+    if last_error is not None:
+        raise last_error
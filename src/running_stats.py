@@ -0,0 +1,285 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class RunningStats:
+    """
+    Estatísticas acumuladas por coluna numérica, atualizadas bloco a bloco.
+
+    Cada bloco é resumido de forma vetorizada (contagem, média, M2, min, max)
+    e combinado com o acumulado pela fórmula paralela de Welford/Chan, então
+    nunca é preciso manter mais de um bloco em memória.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n, dtype=np.float64)
+        self.m2 = np.zeros(n, dtype=np.float64)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+
+    # ------------------------------------------
+    # Atualização
+    # ------------------------------------------
+    def update(self, block) -> "RunningStats":
+        """Incorpora um bloco (DataFrame ou array 2-D, colunas na mesma ordem)."""
+        if isinstance(block, pd.DataFrame):
+            block = block[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        return self.merge(RunningStats.from_array(self.columns, block))
+
+    @classmethod
+    def from_array(cls, columns, values: np.ndarray) -> "RunningStats":
+        """Resume um único bloco 2-D (linhas x colunas) com NaN como ausente."""
+        stats = cls(columns)
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return stats
+
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total = np.where(valid, values, 0.0).sum(axis=0)
+            mean = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+            centered = np.where(valid, values - mean, 0.0)
+            stats.m2 = np.einsum("ij,ij->j", centered, centered)
+        has_data = count > 0
+        stats.count = count.astype(np.int64)
+        stats.mean = mean
+        stats.min = np.where(
+            has_data, np.where(valid, values, np.inf).min(axis=0), np.nan
+        )
+        stats.max = np.where(
+            has_data, np.where(valid, values, -np.inf).max(axis=0), np.nan
+        )
+        return stats
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Combina outro acumulador (mesmas colunas) neste, in-place."""
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = other.mean - self.mean
+            weight = np.where(n > 0, n_b / np.maximum(n, 1), 0.0)
+            self.mean = self.mean + delta * weight
+            self.m2 = self.m2 + other.m2 + delta**2 * n_a * weight
+        self.count = n
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        return self
+
+    def drop(self, column) -> None:
+        """Remove uma coluna que deixou de ser numérica no meio do arquivo."""
+        idx = self.columns.index(column)
+        self.columns.pop(idx)
+        for attr in ("count", "mean", "m2", "min", "max"):
+            setattr(self, attr, np.delete(getattr(self, attr), idx))
+
+    # ------------------------------------------
+    # Leitura
+    # ------------------------------------------
+    @property
+    def var(self) -> np.ndarray:
+        """Variância amostral (ddof=1), como em pandas.describe()."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var)
+
+    @property
+    def std_pop(self) -> np.ndarray:
+        """Desvio populacional (ddof=0), como em scipy.stats.zscore."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, np.sqrt(self.m2 / self.count), np.nan)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Tabela no mesmo formato de describe().T (count, mean, std, min, max)."""
+        return pd.DataFrame(
+            {
+                "count": self.count.astype(np.float64),
+                "mean": np.where(self.count > 0, self.mean, np.nan),
+                "std": self.std,
+                "min": self.min,
+                "max": self.max,
+            },
+            index=pd.Index(self.columns),
+        )
+
+
+class CoMoments:
+    """
+    Somas por par de colunas numéricas, só nas linhas em que as duas estão
+    preenchidas (como DataFrame.corr): contagem, soma e soma dos quadrados de
+    cada coluna do par e soma dos produtos cruzados. Combinável entre blocos
+    como o RunningStats. Os valores entram deslocados por `shift` (média do
+    primeiro bloco) para os produtos em float32 não perderem precisão.
+    """
+
+    def __init__(self, columns, shift=None):
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.shift = np.zeros(n) if shift is None else np.asarray(shift, np.float64)
+        # [i, j]: linhas com i e j preenchidas; somas de x_i nessas linhas
+        self.count = np.zeros((n, n), dtype=np.float64)
+        self.sum = np.zeros((n, n), dtype=np.float64)
+        self.sumsq = np.zeros((n, n), dtype=np.float64)
+        self.cross = np.zeros((n, n), dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, columns, values: np.ndarray, column_block=256, shift=None):
+        """
+        Resume um bloco 2-D (linhas x colunas, NaN = ausente). Os produtos são
+        calculados em float32 (BLAS), uma faixa de colunas por vez; com nulos,
+        contagens e somas por par saem de produtos com a máscara de presença.
+        """
+        values = np.array(values, dtype=np.float32)
+        if shift is None:
+            with np.errstate(invalid="ignore"), warnings.catch_warnings():
+                # Colunas totalmente nulas geram aviso "Mean of empty slice"
+                warnings.simplefilter("ignore", RuntimeWarning)
+                shift = np.nan_to_num(np.nanmean(values, axis=0, dtype=np.float64))
+        moments = cls(columns, shift)
+        if len(values) == 0:
+            return moments
+
+        values -= moments.shift.astype(np.float32)
+        present = ~np.isnan(values)
+        complete = present.all()
+        n = values.shape[1]
+        if complete:
+            moments.count[:] = len(values)
+            moments.sum[:] = values.sum(axis=0, dtype=np.float64)[:, None]
+            moments.sumsq[:] = np.einsum("ij,ij->j", values, values, dtype=np.float64)[
+                :, None
+            ]
+        else:
+            np.nan_to_num(values, copy=False, nan=0.0)
+            mask = present.astype(np.float32)
+            squares = values * values
+
+        for start in range(0, n, column_block):
+            stop = min(start + column_block, n)
+            band = values[:, start:stop].T @ values[:, start:]
+            moments.cross[start:stop, start:] = band
+            moments.cross[start:, start:stop] = band.T
+            if not complete:
+                band = mask[:, start:stop].T @ mask[:, start:]
+                moments.count[start:stop, start:] = band
+                moments.count[start:, start:stop] = band.T
+                moments.sum[start:stop] = values[:, start:stop].T @ mask
+                moments.sumsq[start:stop] = squares[:, start:stop].T @ mask
+        return moments
+
+    def merge(self, other: "CoMoments") -> "CoMoments":
+        """Combina outro acumulador (mesmas colunas) neste, in-place."""
+        if not self.count.any():
+            self.shift = other.shift.copy()
+        # Leva as somas do outro para o deslocamento deste (x - d)
+        d = self.shift - other.shift
+        n, total = other.count, other.sum
+        self.cross += (
+            other.cross
+            - d[None, :] * total
+            - d[:, None] * total.T
+            + np.outer(d, d) * n
+        )
+        self.sumsq += other.sumsq - 2 * d[:, None] * total + (d**2)[:, None] * n
+        self.sum += total - d[:, None] * n
+        self.count += n
+        return self
+
+    def corr(self) -> np.ndarray:
+        """Matriz de correlação de Pearson (NaN em pares constantes ou sem dados)."""
+        n, total = self.count, self.sum
+        var = np.maximum(n * self.sumsq - total**2, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = (n * self.cross - total * total.T) / np.sqrt(var * var.T)
+        corr[~np.isfinite(corr) | (n < 2)] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        np.fill_diagonal(corr, np.where(np.diag(var) > 0, 1.0, np.nan))
+        return corr
+
+
+class QuantileSketch:
+    """
+    Resumo combinável da distribuição de uma coluna: até `max_size`
+    centróides (média, peso) em ordem crescente, cada um com pesos parecidos.
+    Quantis são interpolados entre os centróides; o erro fica na ordem de
+    1/max_size da massa.
+    """
+
+    def __init__(self, means=None, weights=None, max_size: int = 2048):
+        self.max_size = max_size
+        self.means = np.empty(0) if means is None else np.asarray(means, np.float64)
+        self.weights = (
+            np.empty(0) if weights is None else np.asarray(weights, np.float64)
+        )
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray, max_size: int = 2048):
+        """Sketch de valores já ordenados e sem NaN (sem temporários do tamanho da coluna)."""
+        sketch = cls(max_size=max_size)
+        n = len(values)
+        if n <= max_size:
+            sketch.means = values.astype(np.float64)
+            sketch.weights = np.ones(n)
+            return sketch
+        # Pesos unitários: a massa acumulada até i é i + 1, então os cortes de
+        # _compress caem em floor(alvo)
+        targets = np.linspace(0, n, max_size + 1)[1:-1]
+        starts = np.unique(np.concatenate(([0], np.floor(targets).astype(np.int64))))
+        starts = starts[starts < n]
+        sketch.weights = np.diff(np.append(starts, n)).astype(np.float64)
+        sketch.means = (
+            np.add.reduceat(values, starts, dtype=np.float64) / sketch.weights
+        )
+        return sketch
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        if len(means) <= self.max_size:
+            self.means, self.weights = means.astype(np.float64), weights
+            return
+        # Cortes nas mesmas frações de massa acumulada
+        cumulative = np.cumsum(weights)
+        targets = np.linspace(0, cumulative[-1], self.max_size + 1)[1:-1]
+        starts = np.unique(
+            np.concatenate(([0], np.searchsorted(cumulative, targets, "right")))
+        )
+        starts = starts[starts < len(means)]
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Combina outro sketch neste, in-place."""
+        means = np.concatenate((self.means, other.means))
+        weights = np.concatenate((self.weights, other.weights))
+        order = np.argsort(means, kind="stable")
+        self._compress(means[order], weights[order])
+        return self
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def quantile(self, q, lo=np.nan, hi=np.nan) -> np.ndarray:
+        """Quantis `q`, presos ao [min, max] exatos quando informados."""
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if not len(self.means):
+            return np.full(len(q), np.nan)
+        if np.all(self.weights == 1):
+            # Nenhum centróide agregado ainda: quantil exato
+            return np.quantile(self.means, q)
+        # Posição de cada centróide na massa acumulada (ponto médio do peso)
+        centers = np.cumsum(self.weights) - self.weights / 2
+        first = self.means[0] if np.isnan(lo) else lo
+        last = self.means[-1] if np.isnan(hi) else hi
+        return np.interp(
+            q * self.count,
+            np.r_[0.0, centers, self.count],
+            np.r_[first, self.means, last],
+        )
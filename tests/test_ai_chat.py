@@ -0,0 +1,102 @@
+from src import ai_chat, llm_router
+
+
+def test_mock_disabled_without_flag(monkeypatch):
+    monkeypatch.setattr(ai_chat, "MOCK_ENABLED", False)
+    assert ai_chat._candidate("Mock", "", None, []) is None
+
+
+def test_mock_is_never_a_fallback(monkeypatch):
+    monkeypatch.setattr(ai_chat, "MOCK_ENABLED", True)
+    monkeypatch.setattr(llm_router, "MOCK_CHUNK_DELAY_S", 0)
+    monkeypatch.setattr(llm_router, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(ai_chat, "_sdk", lambda provider: None)
+    state = {}
+    chunks = list(
+        ai_chat.stream_response(
+            "quantas linhas?",
+            [],
+            "resumo",
+            "sk-test",
+            "OpenAI",
+            fallbacks=[("Mock", "")],
+            state=state,
+        )
+    )
+    assert chunks == ["⚠️ Nenhum provedor válido configurado ou biblioteca ausente."]
+    assert "provider" not in state
+
+
+def test_mock_answers_when_selected(monkeypatch):
+    monkeypatch.setattr(ai_chat, "MOCK_ENABLED", True)
+    monkeypatch.setattr(llm_router, "MOCK_CHUNK_DELAY_S", 0)
+    state = {}
+    text = "".join(
+        ai_chat.stream_response(
+            "quantas linhas?", [], "resumo", "", "Mock", state=state
+        )
+    )
+    assert "quantas linhas?" in text
+    assert state["provider"] == "Mock"
+
+
+def test_error_after_first_token_is_flagged(monkeypatch):
+    monkeypatch.setattr(llm_router, "backoff_delay", lambda attempt: 0)
+
+    def open_stream():
+        yield "resposta parcial"
+        raise ConnectionError("503 unavailable")
+
+    monkeypatch.setattr(
+        ai_chat,
+        "_candidate",
+        lambda name, key, model_name, messages: llm_router.Candidate(
+            "partial-a", "m", open_stream
+        ),
+    )
+    state = {}
+    chunks = list(
+        ai_chat.stream_response(
+            "quantas linhas?", [], "resumo", "sk-test", "OpenAI", state=state
+        )
+    )
+    assert chunks[0] == "resposta parcial"
+    assert not "".join(chunks).startswith("⚠️")
+    assert state["error"] is True
+
+
+# ==========================================
+# 🧠 Escopo da memória
+# ==========================================
+class FakeUser(dict):
+    @property
+    def is_logged_in(self):
+        return self.get("email") is not None
+
+
+class FakeStreamlit:
+    """Só o que _memory_scope usa: session_state e st.user."""
+
+    def __init__(self, email=None):
+        self.session_state = {"file_hash": "ds1"}
+        self.user = FakeUser(email=email)
+
+
+def test_memory_scope_without_login_is_the_dataset(monkeypatch):
+    monkeypatch.setattr(ai_chat, "st", FakeStreamlit())
+    assert ai_chat._memory_scope() == ("ds1", None)
+
+
+def test_memory_scope_uses_login_email(monkeypatch):
+    monkeypatch.setattr(ai_chat, "st", FakeStreamlit("ana@exemplo.com"))
+    assert ai_chat._memory_scope() == ("ds1", "ana@exemplo.com")
+
+
+def test_memory_scope_per_session_when_configured(monkeypatch):
+    monkeypatch.setattr(ai_chat, "MEMORY_SCOPE", "sessao")
+    first, second = FakeStreamlit("ana@exemplo.com"), FakeStreamlit()
+    monkeypatch.setattr(ai_chat, "st", first)
+    scope = ai_chat._memory_scope()
+    assert scope == ai_chat._memory_scope()
+    monkeypatch.setattr(ai_chat, "st", second)
+    assert ai_chat._memory_scope() != scope
@@ -0,0 +1,198 @@
+import threading
+import time
+
+import pytest
+
+from src import llm_router
+from src.llm_router import Candidate, route_stream
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_router, "backoff_delay", lambda attempt: 0)
+
+
+def flaky(failures, error=ConnectionError("503 unavailable"), text="ok"):
+    """Stream que falha `failures` vezes antes do primeiro pedaço e depois responde."""
+    calls = {"n": 0}
+
+    def open_stream():
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise error
+        yield text
+
+    return open_stream, calls
+
+
+# ==========================================
+# 🔁 Retentativas
+# ==========================================
+def test_retries_before_first_token():
+    open_stream, calls = flaky(2)
+    state = {}
+    chunks = list(route_stream([Candidate("retry-a", "m", open_stream)], state=state))
+    assert chunks == ["ok"]
+    assert calls["n"] == 3
+    assert state == {"started": True, "provider": "retry-a"}
+
+
+def test_gives_up_after_max_attempts():
+    open_stream, calls = flaky(llm_router.MAX_ATTEMPTS)
+    with pytest.raises(ConnectionError):
+        list(route_stream([Candidate("retry-b", "m", open_stream)]))
+    assert calls["n"] == llm_router.MAX_ATTEMPTS
+
+
+def test_does_not_retry_after_first_token():
+    calls = {"n": 0}
+
+    def open_stream():
+        calls["n"] += 1
+        yield "parte"
+        raise ConnectionError("503 unavailable")
+
+    backup_calls = {"n": 0}
+
+    def backup():
+        backup_calls["n"] += 1
+        yield "outro"
+
+    state = {}
+    stream = route_stream(
+        [Candidate("retry-c", "m", open_stream), Candidate("retry-d", "m", backup)],
+        state=state,
+    )
+    assert next(stream) == "parte"
+    with pytest.raises(ConnectionError):
+        next(stream)
+    assert calls["n"] == 1
+    assert backup_calls["n"] == 0
+    assert state["provider"] == "retry-c"
+
+
+def test_non_retryable_error_is_not_retried():
+    open_stream, calls = flaky(1, error=ValueError("401 invalid api key"))
+    with pytest.raises(ValueError):
+        list(route_stream([Candidate("retry-e", "m", open_stream)]))
+    assert calls["n"] == 1
+
+
+# ==========================================
+# 🔀 Failover
+# ==========================================
+def test_fails_over_to_next_provider():
+    broken, broken_calls = flaky(99, error=ValueError("401 invalid api key"))
+    backup, _ = flaky(0, text="reserva")
+    state = {}
+    chunks = list(
+        route_stream(
+            [Candidate("fo-a", "m", broken), Candidate("fo-b", "m", backup)],
+            state=state,
+        )
+    )
+    assert chunks == ["reserva"]
+    assert broken_calls["n"] == 1
+    assert state["provider"] == "fo-b"
+
+
+def test_raises_last_error_when_all_fail():
+    first, _ = flaky(99, error=ValueError("401 first"))
+    second, _ = flaky(99, error=ValueError("401 second"))
+    with pytest.raises(ValueError, match="second"):
+        list(
+            route_stream(
+                [Candidate("fo-c", "m", first), Candidate("fo-d", "m", second)]
+            )
+        )
+
+
+# ==========================================
+# 🏁 Pedido duplicado (hedge)
+# ==========================================
+def test_hedge_cancels_slow_primary(monkeypatch):
+    monkeypatch.setattr(llm_router, "HEDGE_DEFAULT_S", 0.05)
+    primary_closed = threading.Event()
+    primary_chunks = []
+
+    def slow():
+        try:
+            time.sleep(0.3)
+            for i in range(100):
+                primary_chunks.append(i)
+                yield f"lento {i}"
+                time.sleep(0.01)
+        finally:
+            primary_closed.set()
+
+    def fast():
+        yield "rápido"
+
+    state = {}
+    chunks = list(
+        route_stream(
+            [Candidate("hedge-a", "m", slow), Candidate("hedge-b", "m", fast)],
+            hedge=True,
+            state=state,
+        )
+    )
+    assert chunks == ["rápido"]
+    assert state["provider"] == "hedge-b"
+    # O primário é encerrado no primeiro pedaço depois do cancelamento
+    assert primary_closed.wait(2)
+    assert len(primary_chunks) <= 1
+
+
+def test_hedge_keeps_primary_when_it_answers_in_time(monkeypatch):
+    monkeypatch.setattr(llm_router, "HEDGE_DEFAULT_S", 5)
+    secondary, secondary_calls = flaky(0, text="reserva")
+    primary, _ = flaky(0, text="primário")
+    state = {}
+    chunks = list(
+        route_stream(
+            [Candidate("hedge-c", "m", primary), Candidate("hedge-d", "m", secondary)],
+            hedge=True,
+            state=state,
+        )
+    )
+    assert chunks == ["primário"]
+    assert secondary_calls["n"] == 0
+    assert state["provider"] == "hedge-c"
+
+
+def test_hedge_falls_back_when_primary_fails_early(monkeypatch):
+    monkeypatch.setattr(llm_router, "HEDGE_DEFAULT_S", 5)
+    primary, _ = flaky(99, error=ValueError("401 invalid api key"))
+    secondary, _ = flaky(0, text="reserva")
+    state = {}
+    start = time.perf_counter()
+    chunks = list(
+        route_stream(
+            [Candidate("hedge-e", "m", primary), Candidate("hedge-f", "m", secondary)],
+            hedge=True,
+            state=state,
+        )
+    )
+    assert chunks == ["reserva"]
+    assert state["provider"] == "hedge-f"
+    # Não espera o tempo do hedge quando o primário já falhou
+    assert time.perf_counter() - start < 1
+
+
+# ==========================================
+# 🧪 Provedor local
+# ==========================================
+def test_mock_stream_answers_offline(monkeypatch):
+    monkeypatch.setattr(llm_router, "MOCK_CHUNK_DELAY_S", 0)
+    text = "".join(llm_router.mock_stream([{"role": "user", "content": "média?"}]))
+    assert "média?" in text
+
+
+def test_mock_failures_are_retried(monkeypatch):
+    monkeypatch.setattr(llm_router, "MOCK_CHUNK_DELAY_S", 0)
+    rolls = iter([0.0, 0.0, 0.9])
+    monkeypatch.setattr(llm_router.random, "random", lambda: next(rolls))
+    monkeypatch.setattr(llm_router, "MOCK_FAIL_RATE", 0.5)
+    messages = [{"role": "user", "content": "oi"}]
+    candidate = Candidate("mock-a", "local", lambda: llm_router.mock_stream(messages))
+    assert "oi" in "".join(route_stream([candidate]))
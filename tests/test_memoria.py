@@ -0,0 +1,112 @@
+import sqlite3
+import time
+
+import pytest
+
+from utils import memoria_db
+from utils.memoria_backends import SQLiteBackend
+from utils.memoria_index import MemoryIndex
+
+
+def registro(pergunta, file_hash=None, usuario=None, resposta="resposta"):
+    return {
+        "timestamp": "2026-01-01T00:00:00",
+        "pergunta": pergunta,
+        "resposta": resposta,
+        "tipo_analise": "chat",
+        "file_hash": file_hash,
+        "usuario": usuario,
+    }
+
+
+# ==========================================
+# 🔎 Índice por escopo
+# ==========================================
+def test_search_only_returns_same_scope():
+    index = MemoryIndex(n_features=2**12)
+    index.add_many(
+        [
+            registro("média de vendas por região", "ds1", "ana"),
+            registro("média de vendas por região", "ds2", "ana"),
+            registro("média de vendas por região", "ds1", "bia", resposta="outra"),
+        ]
+    )
+    found = index.search("média de vendas", scope=("ds1", "ana"))
+    assert [r["resposta"] for r in found] == ["resposta"]
+    assert index.search("média de vendas", scope=("ds3", "ana")) == []
+    assert len(index.search("média de vendas", k=5)) == 2
+
+
+def test_scope_filter_covers_merged_postings(monkeypatch):
+    monkeypatch.setattr("utils.memoria_index.TAIL_MAX_ENTRIES", 4)
+    index = MemoryIndex(n_features=2**12)
+    for i in range(20):
+        index.add_many([registro(f"correlação idade renda {i}", f"ds{i % 2}", "ana")])
+    found = index.search("correlação idade renda", k=20, scope=("ds1", "ana"))
+    assert len(found) == 10
+    assert all(int(r["pergunta"].split()[-1]) % 2 == 1 for r in found)
+
+
+# ==========================================
+# 💾 SQLite: colunas de escopo e paginação
+# ==========================================
+def test_sqlite_migrates_old_table(tmp_path):
+    path = tmp_path / "old.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE memoria (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "timestamp TEXT NOT NULL, pergunta TEXT, resposta TEXT, tipo_analise TEXT)"
+    )
+    conn.commit()
+    conn.close()
+
+    backend = SQLiteBackend(str(path))
+    backend.insert_many([registro("oi", "ds1", "ana")])
+    assert backend.recent(1)[0]["file_hash"] == "ds1"
+
+
+def test_sqlite_pages_before_id_and_timestamp(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "m.sqlite"))
+    rows = [
+        dict(registro(f"p{i}"), timestamp=f"2026-01-01T00:00:{i:02d}")
+        for i in range(10)
+    ]
+    backend.insert_many(rows)
+    first = backend.page(4, before_ts="2026-01-01T00:00:08")
+    assert [r["pergunta"] for r in first] == ["p7", "p6", "p5", "p4"]
+    second = backend.page(4, before_id=first[-1]["id"], before_ts="2026-01-01T00:00:08")
+    assert [r["pergunta"] for r in second] == ["p3", "p2", "p1", "p0"]
+
+
+# ==========================================
+# 🧠 Carga do índice em segundo plano
+# ==========================================
+@pytest.fixture
+def memoria_local(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "m.sqlite"))
+    monkeypatch.setattr(memoria_db, "_backend", backend)
+    monkeypatch.setattr(memoria_db, "_index", None)
+    monkeypatch.setattr(memoria_db, "MEMORIA_INDEX_PAGE", 3)
+    return backend
+
+
+def test_index_loads_history_in_background(memoria_local):
+    memoria_local.insert_many(
+        [registro(f"histograma da coluna {i}", "ds1", "ana") for i in range(10)]
+    )
+    index = memoria_db.indice_memoria()
+    deadline = time.monotonic() + 5
+    while len(index) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(index) == 10
+    found = memoria_db.memorias_relevantes(
+        "histograma da coluna", k=10, file_hash="ds1", usuario="ana"
+    )
+    assert len(found) == 10
+    assert memoria_db.memorias_relevantes("histograma", file_hash="ds2") == []
+
+
+def test_saved_turn_is_not_indexed_twice(memoria_local):
+    memoria_db.salvar_memoria("outliers em salário", "resposta", "chat", "ds1", "ana")
+    time.sleep(0.2)
+    assert len(memoria_db.indice_memoria()) == 1
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+
+from utils.memoria_queue import WriteBehindQueue
+
+
+def fila(tmp_path, write_batch):
+    return WriteBehindQueue(
+        write_batch,
+        batch_size=5,
+        flush_interval=0.05,
+        spill_path=str(tmp_path / "spill.jsonl"),
+    )
+
+
+def flush(queue, timeout=5) -> bool:
+    """flush() com prazo: uma thread de gravação morta travaria o teste."""
+    done = threading.Event()
+    threading.Thread(target=lambda: (queue.flush(), done.set()), daemon=True).start()
+    return done.wait(timeout)
+
+
+# ==========================================
+# 💾 Arquivo local (spill)
+# ==========================================
+def test_truncated_spill_line_does_not_kill_writer(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text(
+        "".join(json.dumps({"i": i}) + "\n" for i in range(3)) + '{"i": 3, "perg',
+        encoding="utf-8",
+    )
+    written = []
+    queue = fila(tmp_path, written.extend)
+
+    queue.put({"i": 10})
+    assert flush(queue)
+    queue.close()
+
+    assert sorted(r["i"] for r in written) == [0, 1, 2, 10]
+    assert not os.path.exists(f"{spill}.replay")
+    assert not spill.exists()
+    assert (
+        (tmp_path / "spill.jsonl.bad").read_text(encoding="utf-8").startswith('{"i": 3')
+    )
+
+
+def test_writer_survives_failing_spill(tmp_path, monkeypatch):
+    written = []
+    calls = {"n": 0}
+
+    def write_batch(batch):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ConnectionError("backend fora")
+        written.extend(batch)
+
+    queue = fila(tmp_path, write_batch)
+    monkeypatch.setattr(queue, "_append_spill", lambda path, records: 1 / 0)
+    queue.put({"i": 1})
+    assert flush(queue)
+    queue.put({"i": 2})
+    assert flush(queue)
+    queue.close()
+    assert [r["i"] for r in written] == [2]
@@ -1,4 +1,6 @@
 import streamlit as st
+from utils.dataset_store import clear_store
+from utils.response_cache import clear_responses
 
 
 # Funções de callback para garantir a limpeza do estado
@@ -6,6 +8,8 @@ def clear_state_and_caches():
     # 1. Limpa todos os caches do Streamlit
     st.cache_data.clear()
     st.cache_resource.clear()
+    clear_store()
+    clear_responses()
 
     # 2. Limpa TODAS as variáveis da sessão e define o flag de sucesso
     keys_to_delete = list(st.session_state.keys())
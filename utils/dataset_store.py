@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from utils.lazy_imports import optional_import
+
+# Diretório e orçamento de disco do armazenamento local de datasets
+STORE_DIR = os.getenv("EDA_STORE_DIR", ".eda_store")
+STORE_MAX_MB = float(os.getenv("EDA_STORE_MAX_MB", "5120"))
+
+_lock = threading.Lock()
+
+
+def _paths(file_hash: str):
+    return (
+        os.path.join(STORE_DIR, f"{file_hash}.arrow"),
+        os.path.join(STORE_DIR, f"{file_hash}.json"),
+    )
+
+
+def _arrow():
+    """
+    (pyarrow, pyarrow.feather), importados só no primeiro uso do armazenamento
+    (fora da tela de upload), ou None sem o pyarrow (armazenamento desativado).
+    """
+    feather = optional_import("pyarrow.feather", "armazenamento local")
+    if feather is None:
+        return None
+    return optional_import("pyarrow"), feather
+
+
+def is_enabled() -> bool:
+    return STORE_MAX_MB > 0 and _arrow() is not None
+
+
+def _to_pandas(table):
+    """
+    DataFrame sobre o memory map: colunas numéricas sem nulos (gravadas num
+    único bloco) viram arrays NumPy que apontam para o arquivo, sem cópia;
+    as demais (texto, categorias, booleanos, com nulos) são convertidas.
+    """
+    import pandas as pd  # só é usado depois que já há um dataset carregado
+
+    pa, _ = _arrow()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if (
+            column.num_chunks == 1
+            and column.null_count == 0
+            and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type))
+        ):
+            columns[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_dataset(file_hash: str):
+    """
+    Recarrega um DataFrame salvo sob o hash do conteúdo do upload.
+    O arquivo Arrow IPC (Feather sem compressão) é lido via memory map: as
+    colunas numéricas sem nulos ficam no próprio mapeamento (somente
+    leitura), então só as páginas usadas saem do disco. Retorna (data, meta)
+    ou None.
+    """
+    if not is_enabled():
+        return None
+
+    data_path, meta_path = _paths(file_hash)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None
+
+    pa, feather = _arrow()
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        table = feather.read_table(data_path, memory_map=True)
+        data = _to_pandas(table)
+    except (OSError, ValueError, pa.ArrowException):
+        _remove(file_hash)
+        return None
+
+    # Marca o acesso para a política LRU
+    now = time.time()
+    os.utime(data_path, (now, now))
+    return data, meta
+
+
+def save_dataset(file_hash: str, data, meta: dict) -> None:
+    """Salva o DataFrame em Arrow IPC e aplica o orçamento de disco (LRU)."""
+    if not is_enabled():
+        return
+
+    _, feather = _arrow()
+    os.makedirs(STORE_DIR, exist_ok=True)
+    data_path, meta_path = _paths(file_hash)
+
+    with _lock:
+        # Escrita atômica: grava num temporário e renomeia
+        tmp_path = f"{data_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            # Um bloco por coluna: permite a leitura sem cópia em load_dataset
+            feather.write_feather(
+                data,
+                tmp_path,
+                compression="uncompressed",
+                chunksize=max(len(data), 1),
+            )
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        _evict(keep=file_hash)
+
+
+def _remove(file_hash: str) -> None:
+    for path in _paths(file_hash):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _evict(keep: str = None) -> None:
+    """Remove os datasets acessados há mais tempo até caber em STORE_MAX_MB."""
+    entries = []
+    for name in os.listdir(STORE_DIR):
+        if not name.endswith(".arrow"):
+            continue
+        stat = os.stat(os.path.join(STORE_DIR, name))
+        entries.append((stat.st_mtime, stat.st_size, name[: -len(".arrow")]))
+
+    budget = STORE_MAX_MB * 1024**2
+    total = sum(size for _, size, _ in entries)
+    for _, size, file_hash in sorted(entries):
+        if total <= budget:
+            break
+        if file_hash == keep:
+            continue
+        _remove(file_hash)
+        total -= size
+
+
+def clear_store() -> None:
+    """Apaga todos os datasets salvos em disco."""
+    if not os.path.isdir(STORE_DIR):
+        return
+    with _lock:
+        for name in os.listdir(STORE_DIR):
+            os.remove(os.path.join(STORE_DIR, name))
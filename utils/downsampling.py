@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: escolhe `n_out` pontos que preservam o
+    formato visual da série (picos e vales). Espera `x` ordenado e sem NaN
+    em `y`; retorna os índices selecionados (em ordem crescente).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Primeiro e último pontos são mantidos; o resto é dividido em n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Média do próximo bucket (ou o último ponto, no bucket final)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Ponto do bucket atual que forma o maior triângulo com o anterior e a média
+        bx, by = x[start:end], y[start:end]
+        area = np.abs(
+            (x[prev] - avg_x) * (by - y[prev]) - (x[prev] - bx) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+
+    return selected
@@ -0,0 +1,48 @@
+import importlib
+import sys
+import threading
+import time
+
+# Tempo de cada importação feita sob demanda e marcos do início a frio (processo)
+_lock = threading.Lock()
+_timings = {}
+
+
+def lazy_import(name: str, reason: str = None):
+    """
+    Importa o módulo `name` no primeiro uso (abas, provedores de IA) e
+    registra quanto tempo levou; depois sai direto de sys.modules.
+    """
+    # import_module também espera importações em andamento em outra thread
+    cached = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not cached:
+        record_timing(name, time.perf_counter() - start, reason)
+    return module
+
+
+def optional_import(name: str, reason: str = None):
+    """Como lazy_import, mas devolve None se a biblioteca não estiver instalada."""
+    try:
+        return lazy_import(name, reason)
+    except ImportError:
+        return None
+
+
+def record_timing(name: str, seconds: float, reason: str = None) -> None:
+    """Guarda a primeira medição de `name` (as seguintes já não são a frio)."""
+    with _lock:
+        _timings.setdefault(name, (seconds, reason or ""))
+
+
+def import_report():
+    """Tabela com as importações sob demanda e marcos do início, em ordem."""
+    import pandas as pd
+
+    with _lock:
+        items = list(_timings.items())
+    return pd.DataFrame(
+        [(name, reason, seconds) for name, (seconds, reason) in items],
+        columns=["Módulo", "Motivo", "Tempo (s)"],
+    )
@@ -0,0 +1,223 @@
+import re
+import sqlite3
+import threading
+
+# Escopo da interação: dataset e usuário (a busca por similaridade filtra por eles)
+SCOPE_COLUMNS = ("file_hash", "usuario")
+
+
+class MemoriaBackend:
+    """
+    Interface de armazenamento da memória do chat. Registros são dicionários
+    com timestamp, pergunta, resposta, tipo_analise e o escopo da interação
+    (file_hash do dataset e usuario).
+    """
+
+    def insert_many(self, registros: list) -> None:
+        raise NotImplementedError
+
+    def recent(self, limit: int = 10) -> list:
+        """Últimas interações (mais novas primeiro)."""
+        raise NotImplementedError
+
+    def page(self, limit: int, before_id=None, before_ts: str = None) -> list:
+        """
+        Até `limit` interações (mais novas primeiro) com id menor que
+        `before_id` e timestamp anterior a `before_ts`, para ler tudo em partes.
+        """
+        raise NotImplementedError
+
+    def search(self, texto: str, limit: int = 10) -> list:
+        """Interações cuja pergunta ou resposta contém os termos de `texto`."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+# ==========================================
+# ☁️ Supabase
+# ==========================================
+class SupabaseBackend(MemoriaBackend):
+    """Tabela `memoria` no Supabase (cliente criado no primeiro uso)."""
+
+    def __init__(self, url: str, key: str):
+        if not url or not key:
+            raise ValueError(
+                "As variáveis SUPABASE_URL e SUPABASE_KEY não foram carregadas. Verifique o .env."
+            )
+        from supabase import create_client
+
+        self.client = create_client(url, key)
+        self.scoped = True
+
+    def insert_many(self, registros: list) -> None:
+        if not registros:
+            return
+        if self.scoped:
+            try:
+                self.client.table("memoria").insert(registros).execute()
+                return
+            except Exception as e:
+                # Tabela criada antes das colunas de escopo: grava sem elas
+                if not any(column in str(e) for column in SCOPE_COLUMNS):
+                    raise
+                self.scoped = False
+        registros = [
+            {k: v for k, v in r.items() if k not in SCOPE_COLUMNS} for r in registros
+        ]
+        self.client.table("memoria").insert(registros).execute()
+
+    def recent(self, limit: int = 10) -> list:
+        result = (
+            self.client.table("memoria")
+            .select("*")
+            .order("id", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+
+    def page(self, limit: int, before_id=None, before_ts: str = None) -> list:
+        query = self.client.table("memoria").select("*")
+        if before_id is not None:
+            query = query.lt("id", before_id)
+        if before_ts is not None:
+            query = query.lt("timestamp", before_ts)
+        return query.order("id", desc=True).limit(limit).execute().data
+
+    def search(self, texto: str, limit: int = 10) -> list:
+        pattern = f"%{texto}%"
+        result = (
+            self.client.table("memoria")
+            .select("*")
+            .or_(f"pergunta.ilike.{pattern},resposta.ilike.{pattern}")
+            .order("id", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+
+    def clear(self) -> None:
+        self.client.table("memoria").delete().neq("id", 0).execute()
+
+
+# ==========================================
+# 💾 SQLite local (WAL)
+# ==========================================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memoria (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    pergunta TEXT,
+    resposta TEXT,
+    tipo_analise TEXT,
+    file_hash TEXT,
+    usuario TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_memoria_timestamp ON memoria(timestamp);
+CREATE INDEX IF NOT EXISTS idx_memoria_tipo ON memoria(tipo_analise, timestamp);
+"""
+
+# Índice de texto (FTS5) mantido pelo próprio SQLite via triggers
+SQLITE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS memoria_fts USING fts5(
+    pergunta, resposta, content='memoria', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS memoria_ai AFTER INSERT ON memoria BEGIN
+    INSERT INTO memoria_fts(rowid, pergunta, resposta)
+    VALUES (new.id, new.pergunta, new.resposta);
+END;
+CREATE TRIGGER IF NOT EXISTS memoria_ad AFTER DELETE ON memoria BEGIN
+    INSERT INTO memoria_fts(memoria_fts, rowid, pergunta, resposta)
+    VALUES ('delete', old.id, old.pergunta, old.resposta);
+END;
+"""
+
+COLUMNS = ("timestamp", "pergunta", "resposta", "tipo_analise") + SCOPE_COLUMNS
+
+
+class SQLiteBackend(MemoriaBackend):
+    """
+    Memória num arquivo SQLite local em modo WAL (leituras não esperam a
+    gravação). Cada thread reutiliza a própria conexão; busca por texto via
+    FTS5 quando disponível (senão LIKE).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SQLITE_SCHEMA)
+        # Arquivos criados antes das colunas de escopo
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(memoria)")}
+        for column in SCOPE_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE memoria ADD COLUMN {column} TEXT")
+        try:
+            conn.executescript(SQLITE_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert_many(self, registros: list) -> None:
+        if not registros:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO memoria ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(r.get(c) for c in COLUMNS) for r in registros],
+            )
+
+    def recent(self, limit: int = 10) -> list:
+        rows = self._connection().execute(
+            "SELECT * FROM memoria ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        return [dict(row) for row in rows]
+
+    def page(self, limit: int, before_id=None, before_ts: str = None) -> list:
+        rows = self._connection().execute(
+            "SELECT * FROM memoria WHERE (? IS NULL OR id < ?) "
+            "AND (? IS NULL OR timestamp < ?) ORDER BY id DESC LIMIT ?",
+            (before_id, before_id, before_ts, before_ts, limit),
+        )
+        return [dict(row) for row in rows]
+
+    def search(self, texto: str, limit: int = 10) -> list:
+        terms = re.findall(r"\w+", texto)
+        if not terms:
+            return []
+        conn = self._connection()
+        if self.fts:
+            query = " OR ".join(f'"{term}"' for term in terms)
+            rows = conn.execute(
+                "SELECT m.* FROM memoria_fts JOIN memoria m ON m.id = memoria_fts.rowid "
+                "WHERE memoria_fts MATCH ? ORDER BY bm25(memoria_fts) LIMIT ?",
+                (query, limit),
+            )
+        else:
+            pattern = f"%{texto}%"
+            rows = conn.execute(
+                "SELECT * FROM memoria WHERE pergunta LIKE ? OR resposta LIKE ? "
+                "ORDER BY id DESC LIMIT ?",
+                (pattern, pattern, limit),
+            )
+        return [dict(row) for row in rows]
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM memoria")
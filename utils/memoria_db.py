@@ -1,7 +1,10 @@
 from dotenv import load_dotenv
 import os
-from supabase import create_client
+import threading
 from datetime import datetime
+from utils.memoria_backends import SQLiteBackend, SupabaseBackend
+from utils.memoria_index import MemoryIndex
+from utils.memoria_queue import WriteBehindQueue
 
 # ✅ Carregar o .env automaticamente
 load_dotenv()
@@ -10,44 +13,199 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError(
-        "As variáveis SUPABASE_URL e SUPABASE_KEY não foram carregadas. Verifique o .env."
-    )
+# Backend da memória: "supabase" ou "sqlite" (padrão: Supabase se configurado)
+MEMORIA_BACKEND = os.getenv(
+    "EDA_MEMORIA_BACKEND",
+    "supabase" if SUPABASE_URL and SUPABASE_KEY else "sqlite",
+).lower()
+MEMORIA_SQLITE_PATH = os.getenv("EDA_MEMORIA_SQLITE", ".eda_memoria.sqlite")
+
+# Gravação em segundo plano: tamanho do lote, intervalo (s), fila e arquivo local
+MEMORIA_BATCH_SIZE = int(os.getenv("EDA_MEMORIA_BATCH_SIZE", "50"))
+MEMORIA_FLUSH_SECONDS = float(os.getenv("EDA_MEMORIA_FLUSH_SECONDS", "2"))
+MEMORIA_MAX_PENDING = int(os.getenv("EDA_MEMORIA_MAX_PENDING", "1000"))
+MEMORIA_SPILL_PATH = os.getenv("EDA_MEMORIA_SPILL_PATH", ".eda_memoria_spill.jsonl")
+
+# Índice local de similaridade: interações carregadas do backend na criação
+# (em segundo plano, em páginas) e similaridade mínima para uma interação
+# antiga entrar no prompt
+MEMORIA_INDEX_MAX = int(os.getenv("EDA_MEMORIA_INDEX_MAX", "100000"))
+MEMORIA_INDEX_PAGE = int(os.getenv("EDA_MEMORIA_INDEX_PAGE", "5000"))
+MEMORIA_MIN_SCORE = float(os.getenv("EDA_MEMORIA_MIN_SCORE", "0.2"))
+
+_backend = None
+_queue = None
+_queue_lock = threading.Lock()
+_index = None
+_index_lock = threading.Lock()
 
-# Criar cliente
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+def get_backend():
+    """Backend de armazenamento do processo (criado no primeiro uso)."""
+    global _backend
+    with _queue_lock:
+        if _backend is None:
+            if MEMORIA_BACKEND == "sqlite":
+                _backend = SQLiteBackend(MEMORIA_SQLITE_PATH)
+            else:
+                _backend = SupabaseBackend(SUPABASE_URL, SUPABASE_KEY)
+        return _backend
 
-def salvar_memoria(pergunta: str, resposta: str, tipo_analise: str = None):
+
+def salvar_memoria(
+    pergunta: str,
+    resposta: str,
+    tipo_analise: str = None,
+    file_hash: str = None,
+    usuario: str = None,
+):
     """
-    Armazena a interação do agente no banco de dados Supabase.
+    Armazena a interação do agente no backend configurado (Supabase ou SQLite).
+    `file_hash` e `usuario` são o escopo em que ela pode voltar ao contexto.
     """
-    data = {
+    # Índice criado antes do registro: a carga inicial só lê interações
+    # anteriores à criação, então não vê esta em dobro
+    indice = indice_memoria()
+    registro = _registro(pergunta, resposta, tipo_analise, file_hash, usuario)
+    indice.add_many([registro])
+    get_backend().insert_many([registro])
+
+
+def _registro(
+    pergunta: str,
+    resposta: str,
+    tipo_analise: str = None,
+    file_hash: str = None,
+    usuario: str = None,
+) -> dict:
+    return {
         "timestamp": datetime.utcnow().isoformat(),
         "pergunta": pergunta,
         "resposta": resposta,
         "tipo_analise": tipo_analise or "geral",
+        "file_hash": file_hash,
+        "usuario": usuario,
     }
-    supabase.table("memoria").insert(data).execute()
+
+
+def salvar_memorias(registros: list):
+    """
+    Armazena várias interações com um único insert em lote.
+    """
+    get_backend().insert_many(registros)
+
+
+def _fila():
+    """Fila de gravação do processo (criada no primeiro uso)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue(
+                salvar_memorias,
+                batch_size=MEMORIA_BATCH_SIZE,
+                flush_interval=MEMORIA_FLUSH_SECONDS,
+                max_pending=MEMORIA_MAX_PENDING,
+                spill_path=MEMORIA_SPILL_PATH,
+            )
+        return _queue
+
+
+def salvar_memoria_async(
+    pergunta: str,
+    resposta: str,
+    tipo_analise: str = None,
+    file_hash: str = None,
+    usuario: str = None,
+):
+    """
+    Enfileira a interação para gravação em lote em segundo plano (não espera
+    a rede). O horário é o do momento da chamada.
+    """
+    indice = indice_memoria()
+    registro = _registro(pergunta, resposta, tipo_analise, file_hash, usuario)
+    indice.add_many([registro])
+    return _fila().put(registro)
 
 
 def carregar_memoria(limit: int = 10):
     """
     Retorna as últimas interações armazenadas.
     """
-    result = (
-        supabase.table("memoria")
-        .select("*")
-        .order("id", desc=True)
-        .limit(limit)
-        .execute()
+    return get_backend().recent(limit)
+
+
+def buscar_memoria(texto: str, limit: int = 10):
+    """
+    Retorna as interações cuja pergunta ou resposta menciona os termos de `texto`.
+    """
+    return get_backend().search(texto, limit)
+
+
+def indice_memoria() -> MemoryIndex:
+    """
+    Índice de similaridade do processo. Criado vazio; uma thread carrega do
+    backend, em páginas de MEMORIA_INDEX_PAGE, até MEMORIA_INDEX_MAX
+    interações anteriores à criação (o primeiro turno do chat não espera a
+    rede). Depois é atualizado a cada interação salva.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MemoryIndex()
+            threading.Thread(
+                target=_carregar_indice,
+                args=(_index, datetime.utcnow().isoformat()),
+                name="memoria-index",
+                daemon=True,
+            ).start()
+        return _index
+
+
+def _carregar_indice(index: MemoryIndex, antes_de: str) -> None:
+    """Lê o histórico do backend em páginas (mais novas primeiro) para o índice."""
+    loaded, before_id = 0, None
+    try:
+        backend = get_backend()
+        while loaded < MEMORIA_INDEX_MAX and _index is index:
+            page = backend.page(
+                min(MEMORIA_INDEX_PAGE, MEMORIA_INDEX_MAX - loaded),
+                before_id=before_id,
+                before_ts=antes_de,
+            )
+            if not page:
+                break
+            index.add_many(page)
+            loaded += len(page)
+            before_id = page[-1]["id"]
+    except Exception:
+        # Sem backend (ou fora do ar) o índice segue só com as novas interações
+        pass
+
+
+def memorias_relevantes(
+    texto: str,
+    k: int = 3,
+    min_score: float = None,
+    file_hash: str = None,
+    usuario: str = None,
+):
+    """
+    Interações anteriores mais parecidas com `texto` (busca local, sem rede),
+    só do mesmo dataset e usuário: [{"pergunta", "resposta", "score"}], da
+    mais para a menos parecida.
+    """
+    if min_score is None:
+        min_score = MEMORIA_MIN_SCORE
+    return indice_memoria().search(
+        texto, k=k, min_score=min_score, scope=(file_hash, usuario)
     )
-    return result.data
 
 
 def limpar_memoria():
     """
     Remove todos os registros da memória (cuidado!).
     """
-    supabase.table("memoria").delete().neq("id", 0).execute()
+    global _index
+    get_backend().clear()
+    with _index_lock:
+        _index = None
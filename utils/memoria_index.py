@@ -0,0 +1,247 @@
+import re
+import threading
+import unicodedata
+import zlib
+
+import numpy as np
+
+# Dimensão do espaço de hashing das palavras (colisões raras até ~1M termos)
+N_FEATURES = 2**20
+# Entradas novas fora do índice ordenado antes de juntá-las a ele
+TAIL_MAX_ENTRIES = 16384
+# Termos em até MIN_SELECTIVE_DF interações (ou SELECTIVE_DF_RATIO delas) geram
+# candidatas; os mais frequentes só pontuam as candidatas
+MIN_SELECTIVE_DF = 1000
+SELECTIVE_DF_RATIO = 0.02
+# Termos presentes em mais desta fração das interações são ignorados na busca
+# (a partir de MIN_DOCS_MAX_DF interações; abaixo disso valem todos)
+MAX_DF_RATIO = 0.5
+MIN_DOCS_MAX_DF = 1000
+
+STOPWORDS = frozenset(
+    "a o as os de da do das dos e em no na nos nas um uma uns umas por para "
+    "com sem que se ao aos ou sao ser foi qual quais como isso esse essa "
+    "este esta the of and to in is".split()
+)
+
+_ACCENTS = re.compile(r"[\u0300-\u036f]")
+
+
+def tokenize(text: str) -> list:
+    """Palavras em caixa baixa e sem acentos ("Média" == "media"), sem stopwords."""
+    text = _ACCENTS.sub("", unicodedata.normalize("NFKD", str(text).lower()))
+    return [
+        token
+        for token in re.findall(r"\w+", text)
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _features(tokens: list, n_features: int) -> tuple:
+    """(índices de hashing, contagens) dos tokens, sem repetição."""
+    hashed = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) % n_features for token in tokens),
+        dtype=np.int64,
+        count=len(tokens),
+    )
+    return np.unique(hashed, return_counts=True)
+
+
+class MemoryIndex:
+    """
+    Índice de similaridade (TF-IDF com hashing) das interações do chat, em
+    memória e sem rede.
+
+    - Documentos: log(tf) normalizado (norma 1), fixado na inclusão; a
+      consulta leva o IDF atual, então incluir não exige recalcular nada.
+    - Layout por termo (índice invertido em arrays NumPy): a busca só lê as
+      colunas dos termos da pergunta, e o custo não cresce com o vocabulário.
+    - Inclusões vão para uma cauda pequena, juntada ao índice ordenado quando
+      passa de TAIL_MAX_ENTRIES (merge linear, sem reordenar tudo).
+    - Cada interação guarda o escopo (dataset, usuário) em que foi feita; a
+      busca com `scope` só devolve interações daquele escopo.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self.records = []
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self._lock = threading.Lock()
+
+        # Escopo de cada interação (id em _scope_ids), com capacidade dobrada
+        self._scope_ids = {}
+        self._doc_scope = np.empty(1024, dtype=np.int32)
+
+        # Índice ordenado por termo: postings de f em [indptr[f], indptr[f + 1])
+        self._indptr = np.zeros(n_features + 1, dtype=np.int64)
+        self._feat = np.empty(0, dtype=np.int32)
+        self._doc = np.empty(0, dtype=np.int32)
+        self._weight = np.empty(0, dtype=np.float32)
+
+        # Cauda: entradas ainda fora do índice ordenado
+        self._tail_feat, self._tail_doc, self._tail_weight = [], [], []
+        self._tail_size = 0
+        self._tail_cache = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # ------------------------------------------
+    # Inclusão
+    # ------------------------------------------
+    def add(self, pergunta: str, resposta: str = "") -> None:
+        self.add_many([{"pergunta": pergunta, "resposta": resposta}])
+
+    def add_many(self, registros: list) -> None:
+        """
+        Inclui interações (dicionários com pergunta e resposta; o escopo vem
+        de "file_hash" e "usuario", quando presentes).
+        """
+        vectors = []
+        for registro in registros:
+            pergunta = registro.get("pergunta") or ""
+            resposta = registro.get("resposta") or ""
+            feats, counts = _features(
+                tokenize(f"{pergunta} {resposta}"), self.n_features
+            )
+            weights = 1.0 + np.log(counts)
+            if len(weights):
+                weights /= np.sqrt(np.dot(weights, weights))
+            scope = (registro.get("file_hash"), registro.get("usuario"))
+            vectors.append(((pergunta, resposta), scope, feats, weights))
+
+        with self._lock:
+            for record, scope, feats, weights in vectors:
+                doc = len(self.records)
+                self.records.append(record)
+                if doc == len(self._doc_scope):
+                    self._doc_scope = np.resize(self._doc_scope, 2 * doc)
+                self._doc_scope[doc] = self._scope_ids.setdefault(
+                    scope, len(self._scope_ids)
+                )
+                self.df[feats] += 1
+                self._tail_feat.append(feats.astype(np.int32))
+                self._tail_doc.append(np.full(len(feats), doc, dtype=np.int32))
+                self._tail_weight.append(weights.astype(np.float32))
+                self._tail_size += len(feats)
+            self._tail_cache = None
+            if self._tail_size > TAIL_MAX_ENTRIES:
+                self._merge_tail()
+
+    def _merge_tail(self) -> None:
+        """Junta a cauda ao índice ordenado (merge de dois arrays ordenados)."""
+        feat, doc, weight = self._tail_arrays()
+        order = np.argsort(feat, kind="stable")
+        feat, doc, weight = feat[order], doc[order], weight[order]
+
+        positions = np.searchsorted(self._feat, feat, side="right")
+        self._feat = np.insert(self._feat, positions, feat)
+        self._doc = np.insert(self._doc, positions, doc)
+        self._weight = np.insert(self._weight, positions, weight)
+        self._indptr[1:] = np.cumsum(np.bincount(self._feat, minlength=self.n_features))
+        self._tail_feat, self._tail_doc, self._tail_weight = [], [], []
+        self._tail_size = 0
+        self._tail_cache = None
+
+    def _tail_arrays(self) -> tuple:
+        """Cauda concatenada (guardada até a próxima inclusão)."""
+        if self._tail_cache is None:
+            if self._tail_size:
+                self._tail_cache = (
+                    np.concatenate(self._tail_feat),
+                    np.concatenate(self._tail_doc),
+                    np.concatenate(self._tail_weight),
+                )
+            else:
+                empty = np.empty(0, dtype=np.int32)
+                self._tail_cache = (empty, empty, np.empty(0, dtype=np.float32))
+        return self._tail_cache
+
+    # ------------------------------------------
+    # Busca
+    # ------------------------------------------
+    def _postings(self, feature) -> tuple:
+        """Documentos (em ordem crescente) e pesos do termo no índice ordenado."""
+        lo, hi = self._indptr[feature], self._indptr[feature + 1]
+        return self._doc[lo:hi], self._weight[lo:hi]
+
+    def search(
+        self, text: str, k: int = 3, min_score: float = 0.0, scope: tuple = None
+    ) -> list:
+        """
+        As `k` interações mais parecidas com `text` (similaridade do cosseno),
+        em ordem decrescente e sem repetições: [{"pergunta", "resposta", "score"}].
+        Com `scope` = (file_hash, usuario), só as interações desse escopo.
+
+        Candidatas são as interações com algum termo seletivo da pergunta (ou,
+        sem nenhum, com o mais raro); os termos frequentes só somam pontos a
+        elas, buscados por busca binária nas listas ordenadas de documentos.
+        """
+        feats, counts = _features(tokenize(text), self.n_features)
+        with self._lock:
+            n_docs = len(self.records)
+            if not n_docs or not len(feats):
+                return []
+            scope_id = None if scope is None else self._scope_ids.get(tuple(scope))
+            if scope is not None and scope_id is None:
+                return []
+            df = self.df[feats]
+            keep = df > 0
+            if n_docs >= MIN_DOCS_MAX_DF:
+                keep &= df <= MAX_DF_RATIO * n_docs
+            feats, counts, df = feats[keep], counts[keep], df[keep]
+            if not len(feats):
+                return []
+            query = (1.0 + np.log(counts)) * (np.log((1 + n_docs) / (1 + df)) + 1)
+            query /= np.sqrt(np.dot(query, query))
+
+            selective = df <= max(MIN_SELECTIVE_DF, SELECTIVE_DF_RATIO * n_docs)
+            if not selective.any():
+                selective[np.argmin(df)] = True
+            tail_feat, tail_doc, tail_weight = self._tail_arrays()
+            hit = np.isin(tail_feat, feats)
+            if scope_id is not None:
+                hit &= self._doc_scope[tail_doc] == scope_id
+            candidates = np.unique(
+                np.concatenate(
+                    [self._postings(f)[0] for f in feats[selective]] + [tail_doc[hit]]
+                )
+            )
+            if scope_id is not None:
+                candidates = candidates[self._doc_scope[candidates] == scope_id]
+
+            scores = np.zeros(len(candidates))
+            for f, w in zip(feats, query):
+                docs, weights = self._postings(f)
+                if not len(docs):
+                    continue
+                pos = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                found = docs[pos] == candidates
+                scores[found] += weights[pos[found]] * w
+            if hit.any():
+                # Termos da cauda (interações recentes, ainda fora do índice ordenado)
+                np.add.at(
+                    scores,
+                    np.searchsorted(candidates, tail_doc[hit]),
+                    tail_weight[hit] * query[np.searchsorted(feats, tail_feat[hit])],
+                )
+            records = self.records
+
+        selected = np.flatnonzero(scores >= max(min_score, 1e-9))
+        if len(selected) > 4 * k:
+            selected = selected[np.argpartition(-scores[selected], 4 * k - 1)[: 4 * k]]
+        # Maior similaridade primeiro; empate: a incluída por último no índice
+        selected = selected[np.lexsort((-candidates[selected], -scores[selected]))]
+
+        results, seen = [], set()
+        for i in selected:
+            pergunta, resposta = records[candidates[i]]
+            if (pergunta, resposta) in seen:
+                continue
+            seen.add((pergunta, resposta))
+            results.append(
+                {"pergunta": pergunta, "resposta": resposta, "score": float(scores[i])}
+            )
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,214 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Fila de gravação em segundo plano: `put` só enfileira (não bloqueia) e uma
+    thread grava os registros em lotes, quando o lote enche ou o intervalo vence.
+
+    - Fila limitada: com ela cheia (ou o backend fora), os registros vão para
+      um arquivo local (JSON Lines), reenviado depois de uma gravação bem-sucedida.
+      Linhas corrompidas (ex.: gravação interrompida) vão para `<arquivo>.bad`.
+    - No encerramento do processo, o que estiver na fila é gravado (ou salvo
+      no arquivo local).
+    """
+
+    def __init__(
+        self,
+        write_batch,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        spill_path: str = None,
+        close_timeout: float = 10.0,
+    ):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.close_timeout = close_timeout
+        self.written = 0
+        self.spilled = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------
+    # API
+    # ------------------------------------------
+    def put(self, record: dict) -> bool:
+        """Enfileira o registro; com a fila cheia, ele vai direto para o arquivo local."""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._spill([record])
+            return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Espera a fila esvaziar (todos os registros gravados ou salvos localmente)."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Para a thread gravando o que restou; o que não der tempo vai para o arquivo."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(self.close_timeout)
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._spill(leftovers)
+
+    # ------------------------------------------
+    # Thread de gravação
+    # ------------------------------------------
+    def _run(self) -> None:
+        # Nenhuma exceção encerra a thread: sem ela, put acumula e flush trava
+        self._safe_replay()
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+            except Exception:
+                logger.exception("Falha na thread de gravação em segundo plano")
+
+    def _next_batch(self) -> list:
+        """Junta registros até encher o lote ou vencer o intervalo."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # No encerramento não espera o intervalo: grava o que houver
+            remaining = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.2)))
+            except queue.Empty:
+                if remaining <= 0 or (batch and self._stop.is_set()):
+                    break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        try:
+            self.write_batch(batch)
+            self.written += len(batch)
+        except Exception:
+            self._spill(batch)
+        else:
+            # Backend respondeu: reenvia o que tinha ficado no arquivo local
+            self._safe_replay()
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    # ------------------------------------------
+    # Arquivo local (spill)
+    # ------------------------------------------
+    def _spill(self, records: list) -> None:
+        if not self.spill_path:
+            return
+        with self._spill_lock:
+            self._append_spill(self.spill_path, records)
+            self.spilled += len(records)
+
+    @staticmethod
+    def _append_spill(path: str, records: list) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _safe_replay(self) -> None:
+        try:
+            self._replay_spill()
+        except Exception:
+            logger.exception("Falha ao reenviar o arquivo local %s", self.spill_path)
+
+    def _read_replay(self, replay_path: str) -> list:
+        """
+        Registros do arquivo de reenvio, linha a linha: uma linha que não é
+        JSON válido (ex.: a última, truncada) vai para `<arquivo>.bad` em vez
+        de impedir o reenvio das demais.
+        """
+        records, bad = [], []
+        with open(replay_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    bad.append(line.rstrip("\n"))
+        if bad:
+            with open(f"{self.spill_path}.bad", "a", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in bad)
+            logger.warning(
+                "%d linha(s) inválida(s) do arquivo local movidas para %s.bad",
+                len(bad),
+                self.spill_path,
+            )
+        return records
+
+    def _replay_spill(self) -> None:
+        """
+        Reenvia o arquivo local. Sob o lock ele só é movido para `.replay`
+        (novos registros vão para um arquivo novo); o envio, que pode
+        demorar, acontece fora do lock, e o que falhar volta para o arquivo.
+        """
+        if not self.spill_path:
+            return
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            if os.path.exists(self.spill_path):
+                if os.path.exists(replay_path):
+                    # Sobra de um reenvio interrompido: junta os dois
+                    with open(self.spill_path, encoding="utf-8") as f:
+                        pending = f.read()
+                    with open(replay_path, "a", encoding="utf-8") as f:
+                        # Quebra de linha extra: a sobra pode terminar truncada
+                        f.write("\n" + pending)
+                    os.remove(self.spill_path)
+                else:
+                    os.replace(self.spill_path, replay_path)
+            elif not os.path.exists(replay_path):
+                return
+
+        records = self._read_replay(replay_path)
+
+        sent = 0
+        try:
+            for start in range(0, len(records), self.batch_size):
+                chunk = records[start : start + self.batch_size]
+                self.write_batch(chunk)
+                sent = start + len(chunk)
+                self.written += len(chunk)
+        except Exception:
+            pass
+
+        with self._spill_lock:
+            if sent < len(records):
+                self._append_spill(self.spill_path, records[sent:])
+            os.remove(replay_path)
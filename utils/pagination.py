@@ -0,0 +1,54 @@
+import math
+
+import streamlit as st
+
+PAGE_SIZE_OPTIONS = [5, 10, 20, 50]
+
+
+def paginate_columns(columns: list, key: str, default_page_size: int = 10) -> list:
+    """
+    Busca + paginação de colunas para abas com um gráfico por coluna.
+    Só as colunas da página visível são devolvidas, então o custo de
+    renderização não depende da quantidade total de colunas.
+    """
+    if not columns:
+        return []
+
+    col_search, col_size, col_page = st.columns([3, 1, 1])
+
+    with col_search:
+        query = st.text_input(
+            "🔎 Buscar coluna", key=f"{key}_search", placeholder="Nome da coluna..."
+        )
+    matches = [c for c in columns if query.lower() in str(c).lower()]
+    if not matches:
+        st.info("Nenhuma coluna encontrada para a busca.")
+        return []
+
+    with col_size:
+        page_size = st.selectbox(
+            "Por página",
+            PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(default_page_size),
+            key=f"{key}_page_size",
+        )
+
+    n_pages = math.ceil(len(matches) / page_size)
+    with col_page:
+        page = st.number_input(
+            f"Página (de {n_pages})",
+            min_value=1,
+            max_value=n_pages,
+            value=1,
+            step=1,
+            # Nova busca/tamanho de página volta para a página 1
+            key=f"{key}_page_{len(matches)}_{page_size}",
+        )
+    page = min(int(page), n_pages)
+
+    start = (page - 1) * page_size
+    visible = matches[start : start + page_size]
+    st.caption(
+        f"Mostrando {start + 1}–{start + len(visible)} de {len(matches)} colunas."
+    )
+    return visible
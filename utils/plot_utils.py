@@ -1,4 +1,15 @@
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
 import matplotlib.pyplot as plt
+import streamlit as st
+
+# Orçamento de memória (MB) das imagens renderizadas mantidas em cache
+PLOT_CACHE_MB = float(os.getenv("EDA_PLOT_CACHE_MB", "128"))
+PLOT_DPI = 100
+
 
 def apply_blue_theme():
     plt.style.use("dark_background")
@@ -11,3 +22,59 @@ def apply_blue_theme():
         "xtick.color": "white",
         "ytick.color": "white"
     })
+
+
+def fig_to_png(fig) -> bytes:
+    """Renderiza a figura em PNG e fecha a figura (libera a memória do matplotlib)."""
+    buffer = BytesIO()
+    try:
+        fig.savefig(buffer, format="png", dpi=PLOT_DPI, facecolor=fig.get_facecolor())
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+class RenderedImageCache:
+    """Cache LRU de imagens renderizadas (bytes), limitado por tamanho total."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def put(self, key, image: bytes) -> None:
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= len(self._items.pop(key))
+            self._items[key] = image
+            self.total_bytes += len(image)
+            while self.total_bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+@st.cache_resource(show_spinner=False)
+def _image_cache() -> RenderedImageCache:
+    """Cache de imagens compartilhado pelo processo."""
+    return RenderedImageCache(int(PLOT_CACHE_MB * 1024**2))
+
+
+def cached_plot(key, draw) -> bytes:
+    """
+    Retorna o PNG cacheado para `key`; na ausência, chama draw() -> Figure,
+    renderiza, fecha a figura e guarda só os bytes.
+    """
+    cache = _image_cache()
+    image = cache.get(key)
+    if image is None:
+        image = fig_to_png(draw())
+        cache.put(key, image)
+    return image
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Arquivo, validade (horas) e tamanho máximo do cache de respostas do Chat IA
+CACHE_PATH = os.getenv("EDA_LLM_CACHE_PATH", ".eda_llm_cache.sqlite")
+CACHE_TTL_HOURS = float(os.getenv("EDA_LLM_CACHE_TTL_HOURS", "24"))
+CACHE_MAX_ENTRIES = int(os.getenv("EDA_LLM_CACHE_MAX_ENTRIES", "2000"))
+
+_lock = threading.Lock()
+_connection = None
+_stats = {"hits": 0, "misses": 0}
+
+
+def is_enabled() -> bool:
+    return CACHE_TTL_HOURS > 0 and CACHE_MAX_ENTRIES > 0
+
+
+def _connect() -> sqlite3.Connection:
+    """Conexão única do processo (as chamadas são serializadas pelo _lock)."""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            "chave TEXT PRIMARY KEY, resposta TEXT NOT NULL, "
+            "criado REAL NOT NULL, acessado REAL NOT NULL)"
+        )
+        _connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_respostas_acessado ON respostas(acessado)"
+        )
+    return _connection
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Caixa baixa, espaços colapsados e sem pontuação final ("Quais?" == "quais")."""
+    return re.sub(r"\s+", " ", prompt).strip().lower().rstrip("?!. ")
+
+
+def make_key(dataset_hash, provider, model, prompt, history) -> str:
+    """
+    Chave do cache: hash do conteúdo do dataset, provedor/modelo, prompt
+    normalizado e a janela de histórico que vai junto na requisição.
+    """
+    payload = json.dumps(
+        [dataset_hash, provider, model, normalize_prompt(prompt), history],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key: str):
+    """Resposta guardada e ainda válida para a chave, ou None."""
+    if not is_enabled():
+        return None
+
+    now = time.time()
+    with _lock:
+        try:
+            conn = _connect()
+            row = conn.execute(
+                "SELECT resposta FROM respostas WHERE chave = ? AND criado >= ?",
+                (key, now - CACHE_TTL_HOURS * 3600),
+            ).fetchone()
+            if row is not None:
+                # Marca o acesso para a política LRU
+                conn.execute(
+                    "UPDATE respostas SET acessado = ? WHERE chave = ?", (now, key)
+                )
+                conn.commit()
+        except sqlite3.Error:
+            row = None
+
+        _stats["hits" if row is not None else "misses"] += 1
+    return row[0] if row is not None else None
+
+
+def put(key: str, response: str) -> None:
+    """Guarda a resposta e remove as expiradas e as menos usadas além do limite."""
+    if not is_enabled():
+        return
+
+    now = time.time()
+    with _lock:
+        try:
+            conn = _connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            conn.execute(
+                "DELETE FROM respostas WHERE criado < ?",
+                (now - CACHE_TTL_HOURS * 3600,),
+            )
+            conn.execute(
+                "DELETE FROM respostas WHERE chave IN ("
+                "SELECT chave FROM respostas ORDER BY acessado DESC "
+                "LIMIT -1 OFFSET ?)",
+                (CACHE_MAX_ENTRIES,),
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def stats() -> dict:
+    """Acertos, faltas e taxa de acerto desde o início do processo."""
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def clear_responses() -> None:
+    """Apaga todas as respostas guardadas e zera as estatísticas."""
+    with _lock:
+        if os.path.exists(CACHE_PATH):
+            try:
+                conn = _connect()
+                conn.execute("DELETE FROM respostas")
+                conn.commit()
+            except sqlite3.Error:
+                pass
+        _stats["hits"] = _stats["misses"] = 0